@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, Optional
+
+from src.gdelt.article import ArticleRecord, ToneChartSummary
+from src.pipeline.records import CompactArticle
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DATETIME_FORMAT = "%Y%m%d%H%M%S"
+
+
+class WindowAggregate:
+    """
+    Running weighted-tone sums of one (country, window) task, fed with its output records.
+
+    tone_sum and total_count follow the notebook: every article row is weighted by the count
+    of its bin. chart_tone_sum and chart_count weight each bin once, by the full GDELT volume.
+    """
+    __slots__ = ("source_country", "start_datetime", "end_datetime", "bin_counts",
+                 "tone_sum", "total_count", "article_count", "chart_tone_sum", "chart_count")
+
+    def __init__(self):
+        self.source_country: Optional[str] = None
+        self.start_datetime: Optional[datetime] = None
+        self.end_datetime: Optional[datetime] = None
+        self.bin_counts: Dict[int, int] = {}
+        self.tone_sum = 0
+        self.total_count = 0
+        self.article_count = 0
+        self.chart_tone_sum = 0
+        self.chart_count = 0
+
+    def add(self, record):
+        if isinstance(record, ToneChartSummary):
+            self.source_country = record.source_country.replace("sourcecountry:", "")
+            self.start_datetime = record.start_datetime
+            self.end_datetime = record.end_datetime
+            for bin in record.bins:
+                self.bin_counts[bin.bin] = bin.count
+                self.chart_tone_sum += bin.bin * bin.count
+                self.chart_count += bin.count
+        elif isinstance(record, (ArticleRecord, CompactArticle)):
+            count = self.bin_counts.get(record.gdelt_tone, 0)
+            self.tone_sum += record.gdelt_tone * count
+            self.total_count += count
+            self.article_count += 1
+
+
+class AggregateStore:
+    """
+    Per-(country, window) weighted-tone numerators, denominators and counts, kept up to date by
+    the pipeline as tasks complete, so dashboards never have to re-read the article files.
+    """
+    __connection: sqlite3.Connection
+    __lock: Lock
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS weekly (
+                source_country TEXT NOT NULL,
+                start_datetime TEXT NOT NULL,
+                end_datetime TEXT,
+                tone_sum REAL NOT NULL,
+                total_count INTEGER NOT NULL,
+                article_count INTEGER NOT NULL,
+                chart_tone_sum REAL,
+                chart_count INTEGER,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source_country, start_datetime)
+            )
+            """
+        )
+        self.__connection.commit()
+
+    def update(self, aggregate: WindowAggregate):
+        """
+        Store the aggregates of one window, replacing the previous ones so re-runs stay idempotent.
+        """
+        if aggregate.source_country is None:
+            return
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO weekly VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (aggregate.source_country, aggregate.start_datetime.strftime(DATETIME_FORMAT),
+                 aggregate.end_datetime.strftime(DATETIME_FORMAT) if aggregate.end_datetime else None,
+                 aggregate.tone_sum, aggregate.total_count, aggregate.article_count,
+                 aggregate.chart_tone_sum, aggregate.chart_count, time.time())
+            )
+            self.__connection.commit()
+
+    def backfill(self, df: "pd.DataFrame"):
+        """
+        Seed the store from article rows loaded with src.analysis.loader, e.g. output written before the store existed.
+        """
+        import pandas as pd
+
+        from src.analysis.aggregation import aggregate_weekly
+
+        weekly = aggregate_weekly(df.assign(source_country=df['source_country'].str.replace("sourcecountry:", "")))
+        article_counts = df.groupby([df['source_country'].str.replace("sourcecountry:", ""), 'start_datetime']).size()
+        now = time.time()
+        rows = [
+            (row.source_country, pd.Timestamp(row.start_datetime).strftime(DATETIME_FORMAT), None,
+             float(row.tone_sum), int(row.total_count), int(article_counts[(row.source_country, row.start_datetime)]),
+             None, None, now)
+            for row in weekly.itertuples()
+        ]
+        with self.__lock:
+            self.__connection.executemany("INSERT OR REPLACE INTO weekly VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.__connection.commit()
+
+    def weekly(self) -> "pd.DataFrame":
+        """
+        Same columns as aggregate_weekly, plus the article and chart-level counts.
+        """
+        # pandas is only needed to read the store, the pipeline that fills it starts without it
+        import pandas as pd
+
+        with self.__lock:
+            weekly = pd.read_sql_query(
+                "SELECT source_country, start_datetime, tone_sum, total_count, article_count, chart_tone_sum, chart_count "
+                "FROM weekly ORDER BY source_country, start_datetime",
+                self.__connection
+            )
+        weekly['start_datetime'] = pd.to_datetime(weekly['start_datetime'], format=DATETIME_FORMAT)
+        weekly['weighted_tone'] = weekly['tone_sum'] / weekly['total_count']
+        return weekly
+
+    def monthly(self) -> "pd.DataFrame":
+        from src.analysis.aggregation import MONTHLY, roll_up
+
+        return roll_up(self.weekly(), MONTHLY)
+
+    def yearly(self) -> "pd.DataFrame":
+        from src.analysis.aggregation import YEARLY, roll_up
+
+        return roll_up(self.weekly(), YEARLY)
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
@@ -0,0 +1,50 @@
+import pandas as pd
+
+MONTHLY = "ME"
+YEARLY = "YE"
+
+
+def aggregate_weekly(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Weighted tone and total count per (source_country, start_datetime) window.
+
+    Same result as grouped.apply(np.average(x['bin'], weights=x['count'])), computed as one
+    vectorized sum of bin * count over sum of count. tone_sum is kept so the result can be
+    rolled up further without going back to the article rows.
+    """
+    weekly = (
+        df.assign(tone_sum=df['bin'] * df['count'])
+        .groupby(['source_country', 'start_datetime'], sort=True)[['tone_sum', 'count']]
+        .sum()
+        .rename(columns={'count': 'total_count'})
+        .reset_index()
+    )
+    weekly['weighted_tone'] = weekly['tone_sum'] / weekly['total_count']
+    return weekly
+
+
+def roll_up(aggregated: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """
+    Roll aggregate_weekly (or an earlier roll_up) output up to a coarser period, e.g. MONTHLY or YEARLY.
+
+    Equivalent to np.average(x['weighted_tone'], weights=x['total_count']) per period, because
+    summing tone_sum and total_count is exact. Periods are labelled like pd.Grouper, by their end.
+    """
+    rolled = (
+        aggregated.assign(start_datetime=pd.to_datetime(aggregated['start_datetime']))
+        .groupby(['source_country', pd.Grouper(key='start_datetime', freq=freq)])[['tone_sum', 'total_count']]
+        .sum()
+        .reset_index()
+    )
+    # pd.Grouper also emits the empty periods between two windows
+    rolled = rolled[rolled['total_count'] != 0].reset_index(drop=True)
+    rolled['weighted_tone'] = rolled['tone_sum'] / rolled['total_count']
+    return rolled
+
+
+def aggregate_tone(df: pd.DataFrame, freq: str = None) -> pd.DataFrame:
+    """
+    Weighted tone of article rows per window, or per period when freq is given.
+    """
+    weekly = aggregate_weekly(df)
+    return weekly if freq is None else roll_up(weekly, freq)
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+# Encoder of a batch of texts into a (len(texts), dimension) array, e.g. SentenceTransformer.encode
+Encoder = Callable[[List[str]], np.ndarray]
+
+
+def url_key(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "little")
+
+
+class EmbeddingCache:
+    """
+    Sentence embeddings of articles, keyed by a hash of their URL and kept on disk in a
+    memory-mapped float32 array, so every per-country or per-year topic model fit reuses them
+    instead of encoding the corpus again.
+
+    A directory holds the embeddings of one model: vectors.f32 with one row per article,
+    keys.u64 with the URL hash of every row, and meta.json with the model and dimension.
+    Rows are only appended; vectors are written before their keys, so rows past the last key
+    (left by an interrupted encode) are dropped on open.
+    """
+    __directory: str
+    __model: str
+    __dimension: int
+    __rows: Dict[int, int]
+    __vectors: np.ndarray
+
+    def __init__(self, directory: str, model: str, dimension: int):
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__model = model
+        self.__dimension = dimension
+
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as file:
+                meta = json.load(file)
+            if meta != {"model": model, "dimension": dimension}:
+                raise ValueError(f"{directory} holds embeddings of {meta['model']} ({meta['dimension']} dimensions), "
+                                 f"not of {model} ({dimension} dimensions)")
+        else:
+            with open(meta_path, "w") as file:
+                json.dump({"model": model, "dimension": dimension}, file)
+
+        keys_path, vectors_path = self.__path("keys.u64"), self.__path("vectors.f32")
+        keys = np.fromfile(keys_path, dtype=np.uint64) if os.path.exists(keys_path) else np.empty(0, np.uint64)
+        if not os.path.exists(vectors_path):
+            open(vectors_path, "wb").close()
+        row_bytes = 4 * dimension
+        rows = min(len(keys), os.path.getsize(vectors_path) // row_bytes)
+        if rows < len(keys):
+            keys = keys[:rows]
+            keys.tofile(keys_path)
+        if os.path.getsize(vectors_path) != rows * row_bytes:
+            os.truncate(vectors_path, rows * row_bytes)
+        self.__rows = {int(key): row for row, key in enumerate(keys)}
+        self.__remap()
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.__directory, name)
+
+    def __remap(self):
+        rows = len(self.__rows)
+        # np.memmap refuses empty files
+        self.__vectors = np.memmap(self.__path("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.__dimension)) \
+            if rows else np.empty((0, self.__dimension), np.float32)
+
+    @property
+    def model(self) -> str:
+        return self.__model
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+    def __contains__(self, url: str) -> bool:
+        return url_key(url) in self.__rows
+
+    def missing(self, urls: Sequence[str]) -> List[int]:
+        """
+        Positions of the urls that have no embedding yet.
+        """
+        return [index for index, url in enumerate(urls) if url_key(url) not in self.__rows]
+
+    def add(self, urls: Sequence[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(urls), self.__dimension):
+            raise ValueError(f"Expected {len(urls)} vectors of {self.__dimension} dimensions, got shape {vectors.shape}")
+        keys, new_rows, seen = [], [], set()
+        for url, vector in zip(urls, vectors):
+            key = url_key(url)
+            if key not in self.__rows and key not in seen:
+                seen.add(key)
+                keys.append(key)
+                new_rows.append(vector)
+        if not keys:
+            return
+        with open(self.__path("vectors.f32"), "ab") as file:
+            np.asarray(new_rows, dtype=np.float32).tofile(file)
+        with open(self.__path("keys.u64"), "ab") as file:
+            np.asarray(keys, dtype=np.uint64).tofile(file)
+        for key in keys:
+            self.__rows[key] = len(self.__rows)
+        self.__remap()
+
+    def get(self, urls: Sequence[str]) -> np.ndarray:
+        """
+        Embeddings of the urls in their order, read from the memory map into one array.
+        Raises KeyError for a url that has none.
+        """
+        try:
+            rows = [self.__rows[url_key(url)] for url in urls]
+        except KeyError as e:
+            raise KeyError(f"No embedding for URL hash {e.args[0]}") from None
+        return np.asarray(self.__vectors[rows]) if rows else np.empty((0, self.__dimension), np.float32)
+
+    def encode(self, urls: Sequence[str], texts: Sequence[str], encoder: Encoder, batch_size: int = 256) -> np.ndarray:
+        """
+        Embeddings of the texts, encoding only those whose url has none yet, batch_size texts at
+        a time, and appending them to the cache as each batch is done.
+        """
+        missing = self.missing(urls)
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            self.add([urls[index] for index in batch], encoder([texts[index] for index in batch]))
+        return self.get(urls)
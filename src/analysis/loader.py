@@ -0,0 +1,206 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from src.gdelt.article import ArticleRecord, ToneChart, ToneChartSummary, output_record_adapter
+from src.pipeline.records import parse_timestamp
+
+# Columns of load_json, in the order of the rows of read_file
+JSON_SCHEMA = pa.schema([
+    ("source_country", pa.string()),
+    ("start_datetime", pa.timestamp("s")),
+    ("bin", pa.int32()),
+    ("count", pa.int32()),
+    ("title", pa.string()),
+    ("html_title", pa.string()),
+    ("html_body", pa.string()),
+    ("url", pa.string()),
+    ("story", pa.string()),
+])
+TEXT_COLUMNS = ("title", "html_title", "html_body", "url", "story")
+
+
+def json_file_path(base_path: str, source_country: str, year, month) -> str:
+    return f'{base_path}/sourcecountry:{source_country}/{year}/{month}.json'
+
+
+def read_file(base_path: str, source_country: str, year, month) -> List[dict]:
+    """
+    Read one output2/<country>/<year>/<month>.json file into flat article rows.
+    Handles both the streamed record lines and the older one-ToneChart-per-line files.
+    """
+    file_path = json_file_path(base_path, source_country, year, month)
+    if not os.path.exists(file_path):
+        return []
+
+    rows = []
+    bin_counts: Dict[Tuple[str, int], int] = {}
+    with open(file_path, 'r') as file:
+        for line in file:
+            if '"record"' not in line:
+                rows.extend(extract_data_for_dataframe([ToneChart.model_validate_json(line)]))
+                continue
+            record = output_record_adapter.validate_json(line)
+            if isinstance(record, ToneChartSummary):
+                for bin in record.bins:
+                    bin_counts[(record.start_datetime, bin.bin)] = bin.count
+            else:
+                rows.append(article_row(record))
+
+    # Article records only carry their bin, the counts come from the chart summary
+    for row in rows:
+        if row['count'] is None:
+            row['count'] = bin_counts.get((row['start_datetime'], row['bin']))
+    return rows
+
+
+def article_row(article: ArticleRecord) -> dict:
+    return {
+        'source_country': article.source_country,
+        'start_datetime': article.start_datetime,
+        'bin': article.gdelt_tone,
+        'count': None,
+        'title': article.title,
+        'html_title': article.html_title,
+        'html_body': article.html_body,
+        'url': article.url,
+        'story': article.story
+    }
+
+
+def extract_data_for_dataframe(tone_charts: List[ToneChart]) -> List[dict]:
+    """ Extract and flatten data from ToneChart objects for DataFrame creation """
+    rows = []
+    for chart in tone_charts:
+        for bin in chart.tonechart:
+            for article in bin.top_articles:
+                rows.append({
+                    'source_country': chart.source_country,
+                    'start_datetime': chart.start_datetime,
+                    'bin': bin.bin,
+                    'count': bin.count,
+                    'title': article.title,
+                    'html_title': article.html_title,
+                    'html_body': article.html_body,
+                    'url': article.url,
+                    'story': None
+                })
+    return rows
+
+
+def read_file_table(file_path: str, columns: Optional[List[str]] = None) -> pa.Table:
+    """
+    Read one output2 month file straight into Arrow columns, without validating records or
+    building a dict per row. Text columns that are not selected are never collected, so leaving
+    out html_body keeps the article bodies out of memory past the line being decoded.
+    """
+    names = JSON_SCHEMA.names if columns is None else list(columns)
+    unknown = set(names) - set(JSON_SCHEMA.names)
+    if unknown:
+        raise ValueError(f"Unknown columns {sorted(unknown)}, expected some of {JSON_SCHEMA.names}")
+
+    countries, starts, bins, counts = [], [], [], []
+    texts = {name: [] for name in TEXT_COLUMNS if name in names}
+    bin_counts: Dict[Tuple[int, int], int] = {}
+
+    def add(article: dict, bin: int, count: Optional[int], country: str, start: str):
+        countries.append(country)
+        starts.append(parse_timestamp(start))
+        bins.append(bin)
+        counts.append(count)
+        for name, values in texts.items():
+            values.append(article.get(name))
+
+    with open(file_path, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            data = orjson.loads(line)
+            record = data.get('record')
+            if record == 'article':
+                add(data, data['tone'], None, data['sourcecountry'], data['startdatetime'])
+            elif record == 'tonechart':
+                start = parse_timestamp(data['start_datetime'])
+                for bin in data['bins']:
+                    bin_counts[(start, bin['bin'])] = bin['count']
+            else:
+                # Older files hold one whole ToneChart per line
+                for bin in data['tonechart']:
+                    for article in bin['top_articles']:
+                        add(article, bin['bin'], bin['count'], data['source_country'], data['start_datetime'])
+
+    # Article records only carry their bin, the counts come from the chart summary
+    counts = [bin_counts.get((start, bin)) if count is None else count for start, bin, count in zip(starts, bins, counts)]
+    values = {'source_country': countries, 'start_datetime': starts, 'bin': bins, 'count': counts, **texts}
+    schema = pa.schema([JSON_SCHEMA.field(name) for name in names])
+    return pa.Table.from_arrays([pa.array(values[name], field.type) for name, field in zip(names, schema)], schema=schema)
+
+
+def load_json_table(base_path: str, countries: Iterable[str], years: Iterable, months: Iterable,
+                    columns: Optional[List[str]] = None, max_workers: Optional[int] = None) -> pa.Table:
+    """
+    Read the output2 month files of every country, year and month with a pool of processes, one
+    Arrow table per file. The tables are concatenated without copying, in the order of the arguments.
+    """
+    paths = [
+        file_path
+        for source_country in countries for year in years for month in months
+        if os.path.exists(file_path := json_file_path(base_path, source_country, year, month))
+    ]
+    if not paths:
+        return read_file_table(os.devnull, columns)
+    if max_workers == 1 or len(paths) == 1:
+        tables = [read_file_table(file_path, columns) for file_path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            tables = list(executor.map(read_file_table, paths, repeat(columns)))
+    return pa.concat_tables(tables)
+
+
+def load_json(base_path: str, countries: Iterable[str], years: Iterable, months: Iterable,
+              columns: Optional[List[str]] = None, max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Parallel replacement for calling read_file for every country, year and month and building a
+    DataFrame from the rows; e.g. columns=['source_country', 'start_datetime', 'bin', 'count']
+    for the tone aggregation only.
+    """
+    table = load_json_table(base_path, countries, years, months, columns, max_workers)
+    # The Arrow buffers are released column by column while the DataFrame is built
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("country", pa.string()), ("year", pa.int32()), ("month", pa.int32())]),
+    flavor="hive"
+)
+
+
+def load_parquet(base_path: str, countries: Optional[List[str]] = None, years: Optional[List[int]] = None,
+                 months: Optional[List[int]] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load a slice of the Parquet output (see src/pipeline/parquet_sink.py) into a DataFrame.
+    Only the requested columns are read, and country/year/month filters skip whole partitions.
+    The country column is returned as source_country, like the rows of read_file.
+    """
+    dataset = ds.dataset(base_path, format="parquet", partitioning=PARTITIONING)
+
+    conditions = []
+    if countries is not None:
+        conditions.append(ds.field("country").isin(countries))
+    if years is not None:
+        conditions.append(ds.field("year").isin([int(year) for year in years]))
+    if months is not None:
+        conditions.append(ds.field("month").isin([int(month) for month in months]))
+    condition = None
+    for expression in conditions:
+        condition = expression if condition is None else condition & expression
+
+    table = dataset.to_table(columns=columns, filter=condition)
+    return table.to_pandas().rename(columns={"country": "source_country"})
+
@@ -0,0 +1,137 @@
+import os
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional
+
+from loguru import logger
+
+
+def _load_bertopic(path: str):
+    from bertopic import BERTopic
+
+    return BERTopic.load(path)
+
+
+def parse_model_name(filename: str, key_fields: int) -> Optional[Hashable]:
+    """
+    Key of a saved model named like bertopic_<COUNTRY>[_<YEAR>][_...][.ext]: the country when
+    key_fields is 1, the (country, year) tuple when it is 2. None for any other file.
+    """
+    parts = filename.split(".", 1)[0].split("_")
+    if parts[0] != "bertopic" or len(parts) < 1 + key_fields or not all(parts[1:1 + key_fields]):
+        return None
+    return parts[1] if key_fields == 1 else tuple(parts[1:1 + key_fields])
+
+
+class ModelRegistry(Mapping):
+    """
+    Read-only mapping of the BERTopic models saved in a directory, e.g. registry["US"] or
+    registry[("US", "2019")], indexed from their filenames without loading any of them.
+
+    A model is loaded on first access and kept while it is among the max_resident most recently
+    used ones, so a notebook only pays for the models it touches. prefetch() loads models on
+    background threads ahead of use.
+    """
+    __paths: Dict[Hashable, str]
+    __max_resident: int
+    __load: Callable[[str], object]
+    __resident: "OrderedDict[Hashable, object]"
+    __loading: Dict[Hashable, Future]
+    __lock: Lock
+    __executor: Optional[ThreadPoolExecutor]
+    __prefetch_workers: int
+
+    def __init__(self, directory: str, key_fields: int = 1, max_resident: int = 4,
+                 prefetch_workers: int = 2, load: Callable[[str], object] = _load_bertopic):
+        self.__paths = {}
+        for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+            key = parse_model_name(filename, key_fields)
+            if key is not None:
+                self.__paths[key] = os.path.join(directory, filename)
+        self.__max_resident = max_resident
+        self.__load = load
+        self.__resident = OrderedDict()
+        self.__loading = {}
+        self.__lock = Lock()
+        self.__executor = None
+        self.__prefetch_workers = prefetch_workers
+
+    def __len__(self) -> int:
+        return len(self.__paths)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.__paths)
+
+    def __contains__(self, key) -> bool:
+        return key in self.__paths
+
+    def path(self, key: Hashable) -> str:
+        return self.__paths[key]
+
+    def resident(self) -> List[Hashable]:
+        """
+        Keys of the models in memory, least recently used first.
+        """
+        with self.__lock:
+            return list(self.__resident)
+
+    def __getitem__(self, key: Hashable):
+        path = self.__paths[key]
+        with self.__lock:
+            if key in self.__resident:
+                self.__resident.move_to_end(key)
+                return self.__resident[key]
+            future = self.__loading.get(key)
+            owner = future is None
+            if owner:
+                # Concurrent lookups of the same model wait for one load
+                future = self.__loading[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            logger.info(f"Loading model {key} from {path}")
+            model = self.__load(path)
+        except BaseException as e:
+            with self.__lock:
+                del self.__loading[key]
+            future.set_exception(e)
+            raise
+        with self.__lock:
+            del self.__loading[key]
+            self.__resident[key] = model
+            while len(self.__resident) > self.__max_resident:
+                evicted, _ = self.__resident.popitem(last=False)
+                logger.debug(f"Evicted model {evicted}")
+        future.set_result(model)
+        return model
+
+    def prefetch(self, keys: Iterable[Hashable]) -> List[Future]:
+        """
+        Start loading the given models on background threads. Only the last max_resident of them
+        can still be resident when they are used; unknown keys are skipped.
+        """
+        keys = [key for key in dict.fromkeys(keys) if key in self.__paths]
+        if not keys:
+            return []
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(self.__prefetch_workers, thread_name_prefix="model-prefetch")
+        return [self.__executor.submit(self.__getitem__, key) for key in keys]
+
+    def evict(self, key: Optional[Hashable] = None):
+        """
+        Drop one model, or all of them, from memory.
+        """
+        with self.__lock:
+            if key is None:
+                self.__resident.clear()
+            else:
+                self.__resident.pop(key, None)
+
+    def close(self):
+        self.evict()
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,129 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import pandas as pd
+
+from src.analysis.embedding_cache import EmbeddingCache, Encoder
+from src.analysis.loader import json_file_path, read_file_table
+
+# BERTopic's embedding model for language="multilingual"
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+# NLTK stopword lists per country code, the others get DEFAULT_STOPWORD_LANGUAGES
+STOPWORD_LANGUAGES = {"GM": ("german", "english")}
+DEFAULT_STOPWORD_LANGUAGES = ("english", "spanish")
+
+
+class DocumentBatch(NamedTuple):
+    urls: List[str]
+    years: List[int]
+    texts: List[str]
+
+
+def iter_documents(base_path: str, country: str, years: Iterable, months: Iterable,
+                   batch_size: int = 1000) -> Iterator[DocumentBatch]:
+    """
+    "title html_body" of every article of a country, read one month file at a time and yielded in
+    batches of up to batch_size. An article listed in several bins or windows is yielded once, and
+    so is a story syndicated under several URLs (the story column, see src/pipeline/near_duplicates.py),
+    under the URL of its first copy.
+    """
+    seen: Set[str] = set()
+    batch = DocumentBatch([], [], [])
+    for year in years:
+        for month in months:
+            file_path = json_file_path(base_path, country, year, month)
+            if not os.path.exists(file_path):
+                continue
+            table = read_file_table(file_path, ["title", "html_body", "url", "story"])
+            for title, body, url, story in zip(*(column.to_pylist() for column in table.columns)):
+                # Output written without near-duplicate detection has no story
+                key = story or url
+                if key is None or key in seen:
+                    continue
+                seen.add(key)
+                batch.urls.append(key)
+                batch.years.append(int(year))
+                batch.texts.append(f"{title or ''} {body or ''}")
+                if len(batch.urls) >= batch_size:
+                    yield batch
+                    batch = DocumentBatch([], [], [])
+    if batch.urls:
+        yield batch
+
+
+_stop_words: Set[str] = set()
+
+
+def _load_stop_words(languages: Tuple[str, ...]):
+    from nltk.corpus import stopwords
+
+    global _stop_words
+    _stop_words = set(stopwords.words(list(languages)))
+
+
+def remove_stopwords(texts: List[str]) -> List[str]:
+    from nltk.tokenize import word_tokenize
+
+    return [" ".join(word for word in word_tokenize(text) if word not in _stop_words) for text in texts]
+
+
+def preprocess(batches: Iterable[DocumentBatch], country: str, max_workers: Optional[int] = None) -> Iterator[DocumentBatch]:
+    """
+    Remove the stopwords of the country's languages from the batches in a pool of processes,
+    yielding them in order. At most two batches per worker are read ahead, so memory stays
+    bounded whatever the size of the corpus.
+    """
+    languages = STOPWORD_LANGUAGES.get(country, DEFAULT_STOPWORD_LANGUAGES)
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, initializer=_load_stop_words, initargs=(languages,)) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, executor.submit(remove_stopwords, batch.texts)))
+            if len(pending) >= 2 * workers:
+                batch, texts = pending.popleft()
+                yield batch._replace(texts=texts.result())
+        while pending:
+            batch, texts = pending.popleft()
+            yield batch._replace(texts=texts.result())
+
+
+def load_encoder(model: str = EMBEDDING_MODEL) -> Tuple[Encoder, int]:
+    """
+    A sentence-transformers encoder for EmbeddingCache.encode, with its embedding dimension.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    transformer = SentenceTransformer(model)
+    return (lambda texts: transformer.encode(texts, show_progress_bar=False)), transformer.get_sentence_embedding_dimension()
+
+
+def build_corpus(base_path: str, country: str, years: Iterable, months: Iterable, cache: EmbeddingCache,
+                 encoder: Encoder, batch_size: int = 1000, max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Preprocess the articles of a country batch by batch and make sure every one of them has an
+    embedding in the cache, encoding only the new ones. Returns one row per article (url, year,
+    document); the embeddings stay on disk until fit_topic_model reads the rows it fits.
+    """
+    urls, doc_years, documents = [], [], []
+    for batch in preprocess(iter_documents(base_path, country, years, months, batch_size), country, max_workers):
+        missing = cache.missing(batch.urls)
+        if missing:
+            cache.add([batch.urls[index] for index in missing], encoder([batch.texts[index] for index in missing]))
+        urls.extend(batch.urls)
+        doc_years.extend(batch.years)
+        documents.extend(batch.texts)
+    return pd.DataFrame({"url": urls, "year": doc_years, "document": documents})
+
+
+def fit_topic_model(corpus: pd.DataFrame, cache: EmbeddingCache, **kwargs):
+    """
+    Fit BERTopic on the rows of a corpus from build_corpus, e.g. corpus[corpus.year == 2019] for
+    a per-year model, with their cached embeddings instead of encoding the documents again.
+    """
+    from bertopic import BERTopic
+
+    topic_model = BERTopic(embedding_model=cache.model, **kwargs)
+    topic_model.fit(corpus["document"].tolist(), cache.get(corpus["url"].tolist()))
+    return topic_model
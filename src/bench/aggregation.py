@@ -0,0 +1,95 @@
+"""
+Benchmark of the vectorized tone aggregation against the notebook's groupby.apply(np.average) code,
+on synthetic article rows covering 2018-2024.
+
+    python -m src.bench.aggregation --countries 11 --articles-per-week 300
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.aggregation import MONTHLY, YEARLY, aggregate_weekly, roll_up
+
+COUNTRIES = ["US", "GM", "UK", "AU", "CA", "SW", "IT", "SP", "SF", "IN", "BR"]
+
+
+def generate_rows(countries: int, articles_per_week: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    weeks = pd.date_range("2018-01-01", "2024-12-31", freq="7D")
+    rows_per_country = len(weeks) * articles_per_week
+    size = countries * rows_per_country
+    bins = rng.integers(-20, 21, size=size)
+    return pd.DataFrame({
+        'source_country': np.repeat(COUNTRIES[:countries], rows_per_country),
+        'start_datetime': np.tile(np.repeat(weeks.values, articles_per_week), countries),
+        'bin': bins,
+        # Every article carries the count of its bin
+        'count': rng.integers(1, 500, size=size),
+    })
+
+
+def apply_weekly(df: pd.DataFrame) -> pd.DataFrame:
+    return df.groupby(['source_country', 'start_datetime']).apply(lambda x: pd.Series({
+        'weighted_tone': np.average(x['bin'], weights=x['count']),
+        'total_count': x['count'].sum()
+    })).reset_index()
+
+
+def apply_roll_up(aggregated_df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    return aggregated_df.groupby(['source_country', pd.Grouper(key='start_datetime', freq=freq)]).apply(lambda x: pd.Series({
+        'weighted_tone': np.average(x['weighted_tone'], weights=x['total_count']),
+        'total_count': x['total_count'].sum()
+    })).reset_index()
+
+
+def apply_from_rows(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    return df.groupby(['source_country', pd.Grouper(key='start_datetime', freq=freq)]).apply(lambda x: pd.Series({
+        'weighted_tone': np.average(x['bin'], weights=x['count']),
+        'total_count': x['count'].sum()
+    })).reset_index()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run(countries: int = 11, articles_per_week: int = 300, seed: int = 42) -> dict:
+    df = generate_rows(countries, articles_per_week, seed)
+
+    # What the notebook does: weekly and monthly from the weekly frame, monthly and yearly from the rows
+    apply_weekly_df, apply_weekly_seconds = timed(apply_weekly, df)
+    apply_monthly_df, apply_monthly_seconds = timed(apply_roll_up, apply_weekly_df, MONTHLY)
+    _, apply_rows_monthly_seconds = timed(apply_from_rows, df, MONTHLY)
+    apply_yearly_df, apply_yearly_seconds = timed(apply_from_rows, df, YEARLY)
+
+    weekly_df, weekly_seconds = timed(aggregate_weekly, df)
+    monthly_df, monthly_seconds = timed(roll_up, weekly_df, MONTHLY)
+    yearly_df, yearly_seconds = timed(roll_up, monthly_df, YEARLY)
+
+    apply_seconds = apply_weekly_seconds + apply_monthly_seconds + apply_rows_monthly_seconds + apply_yearly_seconds
+    vectorized_seconds = weekly_seconds + monthly_seconds + yearly_seconds
+    return {
+        "rows": len(df),
+        "apply_seconds": round(apply_seconds, 3),
+        "vectorized_seconds": round(vectorized_seconds, 3),
+        "speedup": round(apply_seconds / vectorized_seconds, 1),
+        "weekly_matches": bool(np.allclose(apply_weekly_df['weighted_tone'], weekly_df['weighted_tone'])),
+        "monthly_matches": bool(np.allclose(apply_monthly_df['weighted_tone'], monthly_df['weighted_tone'])),
+        "yearly_matches": bool(np.allclose(apply_yearly_df['weighted_tone'], yearly_df['weighted_tone'])),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tone aggregation.")
+    parser.add_argument("--countries", type=int, default=11, help="Number of countries, up to 11")
+    parser.add_argument("--articles-per-week", type=int, default=300, help="Article rows per country and week")
+    parser.add_argument("--seed", type=int, default=42, help="Data seed")
+    args = parser.parse_args()
+
+    result = run(args.countries, args.articles_per_week, args.seed)
+    for key, value in result.items():
+        print(f"{key:>18}: {value}")
@@ -0,0 +1,63 @@
+import random
+from typing import List
+
+WORDS = (
+    "immigration migrant border policy government asylum refugee minister parliament visa "
+    "workers economy election debate court ruling city community support reform vote report "
+    "families children deportation integration labour housing crisis agreement europe america"
+).split()
+
+
+def _sentence(rng: random.Random, min_words: int = 8, max_words: int = 30) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraphs(rng: random.Random, count: int) -> str:
+    return "".join(
+        f"<p>{' '.join(_sentence(rng) for _ in range(rng.randint(2, 6)))} &amp; <a href='/x'>{rng.choice(WORDS)}</a></p>\n"
+        for _ in range(count)
+    )
+
+
+def _boilerplate(rng: random.Random) -> str:
+    nav = "".join(f"<li><a href='/{w}'>{w}</a></li>" for w in rng.sample(WORDS, 8))
+    return (
+        f"<nav><ul>{nav}</ul></nav>"
+        "<script>var analytics = {id: 'UA-000', track: function() { return 1; }};</script>"
+        "<style>.ad { display: none; }</style>"
+        "<!-- advertisement slot -->"
+    )
+
+
+def _page(rng: random.Random, index: int) -> str:
+    title = _sentence(rng, 4, 10)
+    headline = _sentence(rng, 3, 14)
+    layout = index % 3
+    if layout == 0:
+        # Semantic markup, found by the <article>/<main> rule
+        body = f"<article><h1>{headline}</h1>{_paragraphs(rng, rng.randint(4, 20))}</article>"
+    elif layout == 1:
+        # CMS markup, found by the common class name rule
+        body = f"<h1>{headline}</h1><div class='wrapper entry-content'>{_paragraphs(rng, rng.randint(4, 20))}</div>"
+    else:
+        # Tag soup, only the largest-block fallback finds the text
+        depth = rng.randint(20, 120)
+        body = f"<h1>{headline}</h1>" + "<div class='c'>" * depth
+        body += "".join(f"<section>{_paragraphs(rng, rng.randint(1, 4))}</section><div>{_sentence(rng)}</div>" for _ in range(rng.randint(3, 10)))
+        body += "</div>" * depth
+    sidebar = f"<aside><div class='related'>{_paragraphs(rng, 3)}</div></aside>"
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{title} | Example News</title></head>"
+        f"<body>{_boilerplate(rng)}<header><div class='logo'>Example News</div></header>"
+        f"{body}{sidebar}<footer><p>Copyright Example News</p></footer></body></html>"
+    )
+
+
+def generate_html_corpus(size: int = 300, seed: int = 42) -> List[str]:
+    """
+    Fixed, deterministic corpus of news-like pages covering the three BodyParser rules.
+    """
+    rng = random.Random(seed)
+    return [_page(rng, index) for index in range(size)]
@@ -0,0 +1,123 @@
+"""
+Benchmark of GDELT tonechart decoding: the old regex cleanup + pydantic parse of every response,
+against orjson with per-record repair, into pydantic models or into plain tuples.
+
+    python -m src.bench.decoding --bins 41 --articles-per-bin 500 --dirty 5
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import orjson
+
+from src.gdelt.decoding import clean_json_string, decode_json, decode_tonechart_records
+from src.gdelt.responses import ToneChartResponse
+
+
+def generate_tonechart(bins: int, articles_per_bin: int, dirty: int, seed: int = 42) -> bytes:
+    """
+    A tonechart response with `dirty` articles carrying the unescaped backslashes and raw control
+    characters GDELT sometimes sends.
+    """
+    rng = random.Random(seed)
+    chart = []
+    for bin in range(-(bins // 2), bins - bins // 2):
+        articles = [
+            {"url": f"https://news{rng.randrange(1000)}.example.com/{bin}/{index}",
+             "title": f"Article {index} on immigration policy, {rng.random():.6f}"}
+            for index in range(articles_per_bin)
+        ]
+        chart.append({"bin": bin, "count": rng.randrange(1, 10000), "toparts": articles})
+    raw = orjson.dumps({"tonechart": chart})
+
+    for index in rng.sample(range(bins * articles_per_bin), dirty):
+        title = f"Article {index % articles_per_bin} on immigration policy".encode()
+        position = raw.find(title)
+        broken = title + (b" C:\\dir\\x" if index % 2 else b" line\x01break")
+        raw = raw[:position] + broken + raw[position + len(title):]
+    return raw
+
+
+def generate_non_ascii_tonechart(articles: int = 20) -> bytes:
+    """
+    A tonechart with German titles, a title with escaped quotes and an invalid escape in its last
+    article, so the byte offset of the failure is past many multi-byte characters.
+    """
+    toparts = [{"url": f"https://nachrichten.example.de/{index}",
+                "title": f"Flüchtlinge überqueren Österreichs Grenze {index}: Ärger über Kärnten"}
+               for index in range(articles)]
+    toparts[articles // 2]["title"] = 'He said "no"'
+    raw = orjson.dumps({"tonechart": [{"bin": 0, "count": articles, "toparts": toparts}]})
+    title = f"Grenze {articles - 1}:".encode()
+    return raw.replace(title, title + b" C:\\x")
+
+
+def repairs_non_ascii() -> bool:
+    # Only the broken record may change, an escaped quote elsewhere must survive the repair
+    try:
+        articles = decode_tonechart_records(generate_non_ascii_tonechart())[0].top_articles
+    except orjson.JSONDecodeError:
+        return False
+    return articles[10][1] == 'He said "no"' and "C:\\x" in articles[-1][1]
+
+
+def legacy(raw: bytes) -> ToneChartResponse:
+    return ToneChartResponse.model_validate_json(clean_json_string(raw.decode("utf-8")))
+
+
+def fast(raw: bytes) -> ToneChartResponse:
+    return ToneChartResponse.model_validate(decode_json(raw))
+
+
+def measure(function, raw: bytes, repeat: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(raw)
+    seconds = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    result = function(raw)
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    statistics = snapshot.statistics("filename")
+    return {
+        "ms": round(seconds * 1000, 1),
+        "peak_mb": round(peak / 2 ** 20, 1),
+        # Blocks and memory still held by the decoded result
+        "result_blocks": sum(stat.count for stat in statistics),
+        "result_mb": round(sum(stat.size for stat in statistics) / 2 ** 20, 1),
+    }
+
+
+def run(bins: int = 41, articles_per_bin: int = 500, dirty: int = 5, repeat: int = 5, seed: int = 42) -> dict:
+    raw = generate_tonechart(bins, articles_per_bin, dirty, seed)
+    results = {
+        "legacy": measure(legacy, raw, repeat),
+        "orjson+pydantic": measure(fast, raw, repeat),
+        "orjson+tuples": measure(decode_tonechart_records, raw, repeat),
+    }
+    expected = [(bin.bin, bin.count, [(a.url, a.title) for a in bin.top_articles]) for bin in legacy(raw).tonechart]
+    return {
+        "bytes": len(raw),
+        "articles": bins * articles_per_bin,
+        **{f"{name} {key}": value for name, result in results.items() for key, value in result.items()},
+        "matches": [tuple(bin) for bin in decode_tonechart_records(raw)] == expected,
+        "non-ascii repair matches": repairs_non_ascii(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GDELT tonechart decoding.")
+    parser.add_argument("--bins", type=int, default=41, help="Number of tone bins")
+    parser.add_argument("--articles-per-bin", type=int, default=500, help="Top articles in every bin")
+    parser.add_argument("--dirty", type=int, default=5, help="Number of articles with invalid JSON")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per decoder")
+    parser.add_argument("--seed", type=int, default=42, help="Data seed")
+    args = parser.parse_args()
+
+    result = run(args.bins, args.articles_per_bin, args.dirty, args.repeat, args.seed)
+    for key, value in result.items():
+        print(f"{key:>34}: {value}")
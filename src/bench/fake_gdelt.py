@@ -0,0 +1,189 @@
+"""
+Local stand-in for the GDELT DOC API and the news sites it links to, for reproducible benchmarks.
+
+The API answers tonechart requests with a synthetic chart, or replays a recorded GDELT response
+with its article URLs pointed at the local sites. Each article site listens on its own port, so
+every port is a separate host to the fetcher, and serves pages from the fixed HTML corpus of
+src.bench.corpus. Latency and errors are drawn from seeded generators, so two runs with the same
+config see the same responses.
+
+    python -m src.bench.fake_gdelt --hosts 4 --latency-ms 20 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from aiohttp import web
+from pydantic import BaseModel
+
+from src.bench.corpus import generate_html_corpus
+
+API_PATH = "/api/v2/doc/doc"
+
+
+class FakeServerConfig(BaseModel):
+    hosts: int = 4                 # article sites, one port each
+    bins: int = 21                 # tone bins per chart
+    articles_per_bin: int = 10
+    article_pool: int = 5000       # distinct articles; fewer means more duplicates across bins and windows
+    corpus_size: int = 200         # distinct HTML pages
+    latency_ms: float = 20         # mean article latency, exponentially distributed
+    api_latency_ms: float = 50
+    error_rate: float = 0.0        # share of articles answered with a 500
+    api_error_rate: float = 0.0    # share of API calls answered with a 503
+    recorded_tonechart: Optional[str] = None  # saved GDELT tonechart response to replay
+    seed: int = 42
+
+
+def stable_hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha256(value.encode("utf-8")).digest()[:8], "big")
+
+
+class FakeGDELT:
+    config: FakeServerConfig
+    ports: List[int]
+    __corpus: List[str]
+    __recorded: Optional[dict]
+    __attempts: Dict[str, int]
+
+    def __init__(self, config: FakeServerConfig):
+        self.config = config
+        self.ports = []
+        self.__corpus = generate_html_corpus(config.corpus_size, config.seed)
+        self.__recorded = None
+        if config.recorded_tonechart:
+            with open(config.recorded_tonechart, "rb") as file:
+                self.__recorded = json.loads(file.read().decode("utf-8", errors="replace"), strict=False)
+        self.__attempts = defaultdict(int)
+
+    def article_url(self, article_id: int) -> str:
+        port = self.ports[article_id % len(self.ports)]
+        return f"http://127.0.0.1:{port}/article/{article_id}.html"
+
+    def __rng(self, key: str) -> random.Random:
+        # Every repeat of a request gets the next draw, so retries can succeed
+        self.__attempts[key] += 1
+        return random.Random(f"{self.config.seed}:{key}:{self.__attempts[key]}")
+
+    def tonechart(self, query: str, start: str) -> dict:
+        if self.__recorded is not None:
+            chart = []
+            for bin in self.__recorded.get("tonechart", []):
+                articles = [
+                    {"url": self.article_url(stable_hash(f"{start}:{article['url']}") % self.config.article_pool), "title": article.get("title", "")}
+                    for article in bin.get("toparts", [])
+                ]
+                chart.append({"bin": bin["bin"], "count": bin["count"], "toparts": articles})
+            return {"tonechart": chart}
+
+        rng = random.Random(f"{self.config.seed}:{query}:{start}")
+        half = self.config.bins // 2
+        chart = []
+        for bin in range(-half, self.config.bins - half):
+            articles = []
+            for _ in range(self.config.articles_per_bin):
+                article_id = rng.randrange(self.config.article_pool)
+                articles.append({"url": self.article_url(article_id), "title": f"Article {article_id}"})
+            chart.append({"bin": bin, "count": rng.randrange(1, 1000), "toparts": articles})
+        return {"tonechart": chart}
+
+    async def api(self, request: web.Request) -> web.Response:
+        rng = self.__rng(request.path_qs)
+        await asyncio.sleep(rng.expovariate(1000 / self.config.api_latency_ms) if self.config.api_latency_ms else 0)
+        if rng.random() < self.config.api_error_rate:
+            return web.Response(status=503, text="Service Unavailable")
+        chart = self.tonechart(request.query.get("query", ""), request.query.get("STARTDATETIME", ""))
+        return web.json_response(chart)
+
+    async def article(self, request: web.Request) -> web.Response:
+        article_id = int(request.match_info["id"])
+        rng = self.__rng(request.path)
+        await asyncio.sleep(rng.expovariate(1000 / self.config.latency_ms) if self.config.latency_ms else 0)
+        if rng.random() < self.config.error_rate:
+            return web.Response(status=500, text="Internal Server Error")
+        return web.Response(text=self.__corpus[article_id % len(self.__corpus)], content_type="text/html")
+
+
+async def serve(config: FakeServerConfig, ready=None, host: str = "127.0.0.1", port: int = 0):
+    server = FakeGDELT(config)
+    runners = []
+
+    async def start(app: web.Application, bind_port: int) -> int:
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, bind_port)
+        await site.start()
+        runners.append(runner)
+        return runner.addresses[0][1]
+
+    api_app = web.Application()
+    api_app.router.add_get(API_PATH, server.api)
+    api_port = await start(api_app, port)
+    for _ in range(config.hosts):
+        site_app = web.Application()
+        site_app.router.add_get("/article/{id:\\d+}.html", server.article)
+        server.ports.append(await start(site_app, 0))
+
+    addresses = {"api_url": f"http://{host}:{api_port}{API_PATH}", "ports": server.ports}
+    if ready is not None:
+        ready.send(addresses)
+    else:
+        print(json.dumps(addresses))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def _serve_process(config: dict, ready):
+    asyncio.run(serve(FakeServerConfig(**config), ready))
+
+
+class FakeGDELTServer:
+    """
+    Runs the fake server in a separate process for the duration of a with block, so its CPU time
+    does not count against the pipeline being measured.
+    """
+    config: FakeServerConfig
+    api_url: Optional[str]
+    __process: Optional[multiprocessing.Process]
+
+    def __init__(self, config: FakeServerConfig):
+        self.config = config
+        self.api_url = None
+        self.__process = None
+
+    def __enter__(self) -> "FakeGDELTServer":
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        self.__process = context.Process(target=_serve_process, args=(self.config.model_dump(), sender), daemon=True)
+        self.__process.start()
+        if not receiver.poll(60):
+            self.__process.terminate()
+            raise RuntimeError("Fake GDELT server did not start")
+        self.api_url = receiver.recv()["api_url"]
+        return self
+
+    def __exit__(self, *exc_info):
+        self.__process.terminate()
+        self.__process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake GDELT API and news sites.")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the API")
+    parser.add_argument("--hosts", type=int, default=4, help="Number of article sites")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Mean article latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of failing articles")
+    parser.add_argument("--recorded-tonechart", type=str, default=None, help="GDELT tonechart response to replay")
+    args = parser.parse_args()
+
+    config = FakeServerConfig(hosts=args.hosts, latency_ms=args.latency_ms, error_rate=args.error_rate,
+                              recorded_tonechart=args.recorded_tonechart)
+    asyncio.run(serve(config, port=args.port))
@@ -0,0 +1,107 @@
+"""
+Benchmark of loading the output2 JSON tree: the notebook's read_file loop into pd.DataFrame against
+load_json, with all columns and with the tone columns only. Each variant runs in a fresh process,
+so its peak RSS is its own.
+
+    python -m src.bench.loader --countries 4 --years 2 --articles-per-week 200 --body-chars 2000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.analysis.loader import load_json, read_file
+from src.pipeline.records import CompactArticle, to_timestamp
+
+COUNTRIES = ["US", "GM", "UK", "CA", "AU", "IN"]
+TONE_COLUMNS = ["source_country", "start_datetime", "bin", "count"]
+VARIANTS = ("read_file", "load_json", "load_json_tone")
+
+
+def generate_tree(base_path: str, countries: int, years: int, articles_per_week: int, body_chars: int, seed: int = 42):
+    """
+    Write month files the way JSONLinesSink does: per weekly window a chart summary, then its articles.
+    """
+    rng = random.Random(seed)
+    body = ("immigration policy debate " * (body_chars // 26 + 1))[:body_chars]
+    for country in COUNTRIES[:countries]:
+        source_country = f"sourcecountry:{country}"
+        for year in range(2018, 2018 + years):
+            for month in range(1, 13):
+                path = f"{base_path}/{source_country}/{year}/{month}.json"
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as file:
+                    for week in range(4):
+                        start = datetime(year, month, 1 + 7 * week)
+                        end = start + timedelta(days=7)
+                        file.write(json.dumps({
+                            "record": "tonechart",
+                            "bins": [{"bin": bin, "count": rng.randrange(1, 1000)} for bin in range(-20, 21)],
+                            "source_country": source_country,
+                            "start_datetime": start.strftime("%Y%m%d%H%M%S"),
+                            "end_datetime": end.strftime("%Y%m%d%H%M%S"),
+                        }) + "\n")
+                        for index in range(articles_per_week):
+                            article = CompactArticle(
+                                f"https://news{rng.randrange(1000)}.example.com/{year}/{month}/{week}/{index}",
+                                f"Article {index}", rng.randrange(-20, 21), to_timestamp(start), to_timestamp(end),
+                                source_country, f"Headline {index}", body,
+                            )
+                            file.write(json.dumps(article.to_dict()) + "\n")
+
+
+def load(variant: str, base_path: str, countries: int, years: int) -> dict:
+    country_codes = COUNTRIES[:countries]
+    year_values = [str(year) for year in range(2018, 2018 + years)]
+    month_values = [str(month) for month in range(1, 13)]
+    start = time.perf_counter()
+    if variant == "read_file":
+        data = []
+        for source_country in country_codes:
+            for year in year_values:
+                for month in month_values:
+                    data.extend(read_file(base_path, source_country, year, month))
+        df = pd.DataFrame(data)
+    else:
+        columns = TONE_COLUMNS if variant == "load_json_tone" else None
+        df = load_json(base_path, country_codes, year_values, month_values, columns=columns)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux; the pool's workers count separately, as RUSAGE_CHILDREN
+    return {
+        "rows": len(df),
+        "seconds": round(seconds, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "frame_mb": round(df.memory_usage(deep=True).sum() / 2 ** 20, 1),
+    }
+
+
+def run(countries: int = 4, years: int = 2, articles_per_week: int = 200, body_chars: int = 2000, seed: int = 42) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as base_path:
+        generate_tree(base_path, countries, years, articles_per_week, body_chars, seed)
+        for variant in VARIANTS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results[variant] = executor.submit(load, variant, base_path, countries, years).result()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark loading the output2 JSON tree.")
+    parser.add_argument("--countries", type=int, default=4, help="Number of countries, up to 6")
+    parser.add_argument("--years", type=int, default=2, help="Years from 2018")
+    parser.add_argument("--articles-per-week", type=int, default=200, help="Article records per country and week")
+    parser.add_argument("--body-chars", type=int, default=2000, help="Length of every article body")
+    parser.add_argument("--seed", type=int, default=42, help="Data seed")
+    args = parser.parse_args()
+
+    results = run(args.countries, args.years, args.articles_per_week, args.body_chars, args.seed)
+    for variant, result in results.items():
+        print(f"{variant:>15}: " + ", ".join(f"{key} {value}" for key, value in result.items()))
@@ -0,0 +1,57 @@
+"""
+Microbenchmark of the article extractors on a fixed HTML corpus.
+
+    python -m src.bench.parsers --size 300 --repeat 3
+"""
+import argparse
+import time
+from typing import Callable, List
+
+from src.bench.corpus import generate_html_corpus
+from src.parsers.article_parser import ArticleParser
+from src.parsers.body_parser import BodyParser
+from src.parsers.title_parser import TitleParser
+
+
+def parse_with_bs4(html: str):
+    return TitleParser.parse(html), BodyParser.parse(html)
+
+
+def time_parser(parse: Callable, corpus: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in corpus:
+            parse(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(size: int = 300, repeat: int = 3, seed: int = 42) -> dict:
+    corpus = generate_html_corpus(size, seed)
+    megabytes = sum(len(html) for html in corpus) / 1e6
+
+    bs4_seconds = time_parser(parse_with_bs4, corpus, repeat)
+    lxml_seconds = time_parser(ArticleParser.parse, corpus, repeat)
+    matching = sum(parse_with_bs4(html) == ArticleParser.parse(html) for html in corpus)
+
+    return {
+        "pages": size,
+        "megabytes": round(megabytes, 2),
+        "bs4_seconds": round(bs4_seconds, 4),
+        "lxml_seconds": round(lxml_seconds, 4),
+        "speedup": round(bs4_seconds / lxml_seconds, 2),
+        "matching_outputs": matching,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the article extractors.")
+    parser.add_argument("--size", type=int, default=300, help="Number of pages in the corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions, the best one is reported")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus seed")
+    args = parser.parse_args()
+
+    result = run(args.size, args.repeat, args.seed)
+    for key, value in result.items():
+        print(f"{key:>18}: {value}")
@@ -0,0 +1,299 @@
+"""
+End-to-end benchmark of the pipeline against the local fake GDELT server.
+
+Runs run_pipeline from src.main on a fresh temporary output directory with the response and HTML
+caches off, and reports tasks and articles per second, per-stage latency (api, host slot wait,
+fetch, parse, write), CPU time and peak memory. Reports are written as JSON named after the current commit, so
+runs of different commits can be compared:
+
+    python -m src.bench.pipeline --countries US,UK --weeks 8 --latency-ms 20 --error-rate 0.02
+    python -m src.bench.pipeline --set num_parse_workers=8 --set max_requests_per_host=4
+    python -m src.bench.pipeline --compare bench_reports/a.json bench_reports/b.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+import src.main as pipeline
+import src.utils.async_requests as async_requests
+from src.analysis.aggregate_store import AggregateStore
+from src.bench.fake_gdelt import FakeGDELTServer, FakeServerConfig
+from src.gdelt.client import AsyncGDELTClient
+from src.parsers.article_parser import ArticleParser
+from src.pipeline.ledger import TaskLedger
+from src.pipeline.records import CompactArticle
+from src.pipeline.sinks import RecordWriter, create_sink
+from src.settings import Settings, parse_overrides
+from src.utils.async_requests import AsyncFetcher
+from src.utils.host_scheduler import HostScheduler
+
+STAGES = ("api", "slot", "fetch", "parse", "write")
+
+# The benchmark measures the pipeline, not GDELT's pacing or the caches
+BENCH_SETTINGS = {
+    "gdelt_cache_backend": "none",
+    "html_cache_enabled": False,
+    "gdelt_requests_per_second": 1000.0,
+    "gdelt_min_requests_per_second": 1000.0,
+    "gdelt_max_requests_per_second": 1000.0,
+    "gdelt_backoff_base": 0.05,
+    "gdelt_backoff_max": 1.0,
+}
+
+
+class StageTimings:
+    """
+    Durations of every call of each pipeline stage, in seconds.
+    """
+    __samples: Dict[str, List[float]]
+
+    def __init__(self):
+        self.__samples = defaultdict(list)
+
+    def record(self, stage: str, seconds: float):
+        self.__samples[stage].append(seconds)
+
+    def summary(self) -> Dict[str, dict]:
+        summary = {}
+        for stage in STAGES:
+            samples = np.array(self.__samples.get(stage, []))
+            if not len(samples):
+                continue
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+            summary[stage] = {
+                "count": len(samples),
+                "total_s": round(float(samples.sum()), 3),
+                "mean_ms": round(float(samples.mean()) * 1000, 2),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+            }
+        return summary
+
+
+def timed_parse(html: str) -> Tuple[Tuple[Optional[str], Optional[str]], float]:
+    # Runs in the parse workers, so the time excludes queueing for a worker
+    start = time.perf_counter()
+    result = ArticleParser.parse(html)
+    return result, time.perf_counter() - start
+
+
+@contextmanager
+def instrument(timings: StageTimings) -> Iterator[Dict[str, int]]:
+    """
+    Wrap the stage functions of the pipeline with timers for the duration of the block.
+    """
+    counts = {"articles": 0, "records": 0}
+    fetch_tonechart_records = AsyncGDELTClient.fetch_tonechart_records
+    slot = HostScheduler.slot
+    track = async_requests.track
+    write_batch = RecordWriter.write_batch
+    extract_article = pipeline.extract_article
+
+    async def timed_fetch_tonechart_records(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fetch_tonechart_records(self, *args, **kwargs)
+        finally:
+            timings.record("api", time.perf_counter() - start)
+
+    @asynccontextmanager
+    async def timed_slot(self, url: str):
+        start = time.perf_counter()
+        async with slot(self, url):
+            timings.record("slot", time.perf_counter() - start)
+            yield
+
+    @contextmanager
+    def timed_track(stage: str):
+        # Only the fetch stage is timed inside AsyncFetcher, once the host slot is held
+        start = time.perf_counter()
+        try:
+            with track(stage):
+                yield
+        finally:
+            timings.record(stage, time.perf_counter() - start)
+
+    async def timed_extract_article(article: CompactArticle, fetcher: AsyncFetcher, parse_executor):
+        html = await pipeline.fetch_html_for_article(article, fetcher)
+        loop = asyncio.get_running_loop()
+        result, seconds = await loop.run_in_executor(parse_executor, timed_parse, html)
+        timings.record("parse", seconds)
+        return result
+
+    def timed_write_batch(self, batch):
+        start = time.perf_counter()
+        try:
+            return write_batch(self, batch)
+        finally:
+            timings.record("write", time.perf_counter() - start)
+            counts["records"] += len(batch)
+            counts["articles"] += sum(1 for _, item in batch if isinstance(item, CompactArticle))
+
+    AsyncGDELTClient.fetch_tonechart_records = timed_fetch_tonechart_records
+    HostScheduler.slot = timed_slot
+    async_requests.track = timed_track
+    RecordWriter.write_batch = timed_write_batch
+    pipeline.extract_article = timed_extract_article
+    try:
+        yield counts
+    finally:
+        AsyncGDELTClient.fetch_tonechart_records = fetch_tonechart_records
+        HostScheduler.slot = slot
+        async_requests.track = track
+        RecordWriter.write_batch = write_batch
+        pipeline.extract_article = extract_article
+
+
+def git_revision() -> Dict[str, Optional[str]]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def run(countries: List[str], weeks: int, server_config: FakeServerConfig, overrides: Optional[dict] = None) -> dict:
+    values = {**BENCH_SETTINGS, **(overrides or {})}
+
+    start_date = datetime(2018, 1, 1)
+    windows = [(start_date + timedelta(weeks=week), start_date + timedelta(weeks=week + 1)) for week in range(weeks)]
+    timings = StageTimings()
+    with tempfile.TemporaryDirectory() as output_dir, FakeGDELTServer(server_config) as server:
+        # A fresh near-duplicate index, stories indexed by earlier runs would skip their copies
+        settings = Settings(**{"near_duplicate_index_path": os.path.join(output_dir, ".near_duplicates.sqlite"),
+                               **values, "gdelt_doc_base_url": server.api_url})
+        sink = create_sink(settings.output_sink, output_dir, output_dir, settings.parquet_row_group_size)
+        ledger = TaskLedger(os.path.join(output_dir, ".ledger.sqlite"))
+        store = AggregateStore(os.path.join(output_dir, ".aggregates.sqlite")) if settings.aggregate_store_enabled else None
+        ledger.add_tasks([(country, start, end) for country in countries for start, end in windows])
+        tasks = ledger.runnable_tasks(settings.max_task_attempts)
+
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        with instrument(timings) as counts:
+            wall_start = time.perf_counter()
+            asyncio.run(pipeline.run_pipeline(settings, tasks, ledger, RecordWriter(sink, ledger, store)))
+            wall = time.perf_counter() - wall_start
+        # The parse workers have exited by now, the server has not
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        task_states = ledger.summary()
+        ledger.close()
+        if store is not None:
+            store.close()
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        **git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "countries": countries,
+            "weeks": weeks,
+            "server": server_config.model_dump(),
+            "settings": {name: getattr(settings, name) for name in sorted(values)},
+        },
+        "results": {
+            "tasks": len(tasks),
+            "task_states": task_states,
+            "articles": counts["articles"],
+            "records": counts["records"],
+            "wall_s": round(wall, 3),
+            "tasks_per_s": round(len(tasks) / wall, 3),
+            "articles_per_s": round(counts["articles"] / wall, 1),
+            "cpu_s": round((usage.ru_utime + usage.ru_stime) - (usage_before.ru_utime + usage_before.ru_stime), 3),
+            "workers_cpu_s": round((children.ru_utime + children.ru_stime) - (children_before.ru_utime + children_before.ru_stime), 3),
+            "peak_rss_mb": round(usage.ru_maxrss * rss_unit / 2 ** 20, 1),
+            "workers_peak_rss_mb": round(children.ru_maxrss * rss_unit / 2 ** 20, 1),
+            "stages": timings.summary(),
+        },
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as file:
+        old = json.load(file)
+    with open(new_path) as file:
+        new = json.load(file)
+    if old["config"] != new["config"]:
+        print("Warning: the reports were run with different configs")
+    old_results, new_results = flatten(old["results"]), flatten(new["results"])
+    print(f"{'metric':>28} {old['commit'] or 'old':>12} {new['commit'] or 'new':>12} {'change':>9}")
+    for key in old_results:
+        if key not in new_results:
+            continue
+        before, after = old_results[key], new_results[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else ""
+        print(f"{key:>28} {before:>12} {after:>12} {change:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local fake GDELT server.")
+    parser.add_argument("--countries", type=str, default="US,UK", help="Comma separated source countries")
+    parser.add_argument("--weeks", type=int, default=8, help="Weekly windows per country")
+    parser.add_argument("--hosts", type=int, default=4, help="Number of fake news sites")
+    parser.add_argument("--articles-per-bin", type=int, default=10, help="Top articles per tone bin")
+    parser.add_argument("--article-pool", type=int, default=5000, help="Distinct articles, fewer means more duplicates")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Mean article latency")
+    parser.add_argument("--api-latency-ms", type=float, default=50, help="Mean API latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of articles answered with a 500")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="Share of API calls answered with a 503")
+    parser.add_argument("--recorded-tonechart", type=str, default=None, help="GDELT tonechart response to replay")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the fake server")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="Override a pipeline setting")
+    parser.add_argument("--log-level", type=str, default="CRITICAL", help="Pipeline log level, failed articles log at ERROR")
+    parser.add_argument("--report-dir", type=str, default="bench_reports", help="Where to write the JSON report")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two reports instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    server_config = FakeServerConfig(
+        hosts=args.hosts, articles_per_bin=args.articles_per_bin, article_pool=args.article_pool,
+        latency_ms=args.latency_ms, api_latency_ms=args.api_latency_ms, error_rate=args.error_rate,
+        api_error_rate=args.api_error_rate, recorded_tonechart=args.recorded_tonechart, seed=args.seed,
+    )
+    report = run(args.countries.split(","), args.weeks, server_config, parse_overrides(args.set))
+
+    os.makedirs(args.report_dir, exist_ok=True)
+    path = os.path.join(args.report_dir, f"pipeline-{datetime.now():%Y%m%d-%H%M%S}-{report['commit'] or 'nogit'}.json")
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+    for key, value in flatten(report["results"]).items():
+        print(f"{key:>28}: {value}")
+    print(f"Report written to {path}")
@@ -0,0 +1,143 @@
+"""
+Benchmark of the pipeline's in-memory article representation: pydantic ArticleRecord against the
+slotted CompactArticle, per 10k articles. Reports traced heap and RSS growth, pickle size and
+time, and the cost of serializing to the output JSON dict.
+
+    python -m src.bench.records --articles 10000 --body-chars 0
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import pickle
+import random
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from src.gdelt.article import ArticleRecord
+from src.pipeline.records import CompactArticle, to_timestamp
+
+COUNTRIES = ["sourcecountry:US", "sourcecountry:GM", "sourcecountry:UK", "sourcecountry:AU"]
+
+
+def generate_fields(articles: int, body_chars: int, seed: int = 42) -> List[tuple]:
+    rng = random.Random(seed)
+    start = datetime(2018, 1, 1)
+    fields = []
+    for index in range(articles):
+        start_datetime = start + timedelta(days=7 * rng.randrange(52 * 7))
+        body = "".join(rng.choice("abcdefghij ") for _ in range(body_chars)) if body_chars else None
+        fields.append((
+            f"https://news{rng.randrange(1000)}.example.com/article/{index}",
+            f"Article {index} on immigration policy",
+            rng.randrange(-20, 21),
+            start_datetime,
+            start_datetime + timedelta(days=7),
+            # Countries are decoded per response in the pipeline, so every article gets its own string
+            "".join(rng.choice(COUNTRIES)),
+            f"Headline {index}" if body_chars else None,
+            body,
+        ))
+    return fields
+
+
+def build_records(fields: List[tuple]) -> list:
+    return [
+        ArticleRecord(url=url, title=title, tone=tone, startdatetime=start, enddatetime=end, sourcecountry=country,
+                      html_title=html_title, html_body=html_body)
+        for url, title, tone, start, end, country, html_title, html_body in fields
+    ]
+
+
+def build_compact(fields: List[tuple]) -> list:
+    return [
+        CompactArticle(url, title, tone, to_timestamp(start), to_timestamp(end), country, html_title, html_body)
+        for url, title, tone, start, end, country, html_title, html_body in fields
+    ]
+
+
+def rss_bytes() -> int:
+    # Linux only; 0 elsewhere
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def measure(build: Callable[[List[tuple]], list], dump: Callable, fields: List[tuple]) -> dict:
+    gc.collect()
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    start = time.perf_counter()
+    articles = build(fields)
+    build_seconds = time.perf_counter() - start
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = rss_bytes() - rss_before
+
+    start = time.perf_counter()
+    payload = pickle.dumps(articles, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.loads(payload)
+    pickle_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for article in articles:
+        dump(article)
+    dump_seconds = time.perf_counter() - start
+
+    scale = 10000 / len(fields)
+    return {
+        "build_ms": round(build_seconds * 1000, 1),
+        "traced_kb_per_10k": round(traced * scale / 1024),
+        "rss_kb_per_10k": round(rss * scale / 1024),
+        "pickle_kb_per_10k": round(len(payload) * scale / 1024),
+        "pickle_roundtrip_ms": round(pickle_seconds * 1000, 1),
+        "to_dict_ms": round(dump_seconds * 1000, 1),
+    }
+
+
+def dump_record(record: ArticleRecord) -> dict:
+    return record.model_dump(by_alias=True, exclude_none=True)
+
+
+VARIANTS = {
+    "pydantic": (build_records, dump_record),
+    "compact": (build_compact, CompactArticle.to_dict),
+}
+
+
+def measure_variant(name: str, articles: int, body_chars: int, seed: int) -> dict:
+    build, dump = VARIANTS[name]
+    return measure(build, dump, generate_fields(articles, body_chars, seed))
+
+
+def run(articles: int = 10000, body_chars: int = 0, seed: int = 42) -> dict:
+    results = {}
+    for name in VARIANTS:
+        # A fresh process per variant, so RSS growth is not hidden by memory the other one freed
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results[name] = executor.submit(measure_variant, name, articles, body_chars, seed).result()
+    fields = generate_fields(1000, body_chars, seed)
+    records, compact = build_records(fields), build_compact(fields)
+    return {
+        "articles": articles,
+        **{f"{name} {key}": value for name, result in results.items() for key, value in result.items()},
+        "matches": all(record.model_dump(by_alias=True, exclude_none=True) == article.to_dict()
+                       for record, article in zip(records, compact)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory article representation.")
+    parser.add_argument("--articles", type=int, default=10000, help="Number of articles")
+    parser.add_argument("--body-chars", type=int, default=0, help="Length of the extracted body, 0 for none")
+    parser.add_argument("--seed", type=int, default=42, help="Data seed")
+    args = parser.parse_args()
+
+    result = run(args.articles, args.body_chars, args.seed)
+    for key, value in result.items():
+        print(f"{key:>30}: {value}")
@@ -0,0 +1,178 @@
+"""
+Command line entry point of the pipeline:
+
+    python -m src fetch US UK --start 2018-01-01 --end 2019-01-01
+    python -m src fetch US --range 2018-01-01:2018-07-01 --range 2020-01-01:2021-01-01 --workers 4
+    python -m src resume
+    python -m src worker
+    python -m src aggregate US GM --freq monthly --output monthly.csv
+    python -m src bench pipeline --countries US,UK --weeks 8
+
+Only argparse is imported up front; every command imports what it needs when it runs, so help,
+argument errors and bench commands do not pay for the pipeline's imports.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+COMMANDS = ("fetch", "resume", "worker", "aggregate", "bench")
+BENCHMARKS = ("pipeline", "parsers", "decoding", "records", "aggregation", "loader", "fake_gdelt")
+
+
+def source_country(code: str) -> str:
+    return code if ":" in code else f"sourcecountry:{code}"
+
+
+def date_range(value: str) -> Tuple[datetime, datetime]:
+    start, separator, end = value.partition(":")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected START:END, got {value}")
+    return datetime.fromisoformat(start), datetime.fromisoformat(end)
+
+
+def load_settings(args: argparse.Namespace):
+    from pydantic import ValidationError
+
+    from src.settings import Settings, parse_overrides
+
+    try:
+        overrides = parse_overrides(args.set)
+        if getattr(args, "start", None):
+            overrides["start_date"] = args.start
+        if getattr(args, "end", None):
+            overrides["end_date"] = args.end
+        return Settings(**overrides)
+    except ValidationError as e:
+        # One line per command, not pydantic's multi-line report
+        args.parser.error("invalid settings: " + "; ".join(
+            f"{'.'.join(map(str, error['loc'])) or 'settings'}: {error['msg']}" for error in e.errors()
+        ))
+    except ValueError as e:
+        args.parser.error(str(e))
+
+
+def fetch(args: argparse.Namespace):
+    settings = load_settings(args)
+    plan = args.command == "fetch"
+    if plan:
+        # Planned for the given countries and ranges, or for the configured ones
+        if args.countries:
+            settings.countries = [source_country(code) for code in args.countries]
+        countries, ranges = settings.countries, args.range or None
+    else:
+        # Resumed for the given countries and ranges only, or for everything in the ledger
+        countries = [source_country(code) for code in args.countries] or None
+        ranges = args.range or ([(args.start or datetime.min, args.end or datetime.max)] if args.start or args.end else None)
+
+    from src.main import run_coordinator, run_standalone
+
+    if args.workers:
+        run_coordinator(settings, args.workers, countries, ranges, plan)
+    else:
+        run_standalone(settings, countries, ranges, plan)
+
+
+def worker(args: argparse.Namespace):
+    settings = load_settings(args)
+
+    from src.main import run_worker
+
+    run_worker(settings)
+
+
+def aggregate(args: argparse.Namespace):
+    settings = load_settings(args)
+
+    from src.analysis.aggregate_store import AggregateStore
+    from src.main import sink_dir
+
+    if args.backfill and not os.path.isdir(settings.output_dir):
+        args.parser.error(f"--backfill reads the JSON output, but {settings.output_dir} does not exist "
+                          f"(set output_dir with --set output_dir=PATH)")
+    store_path = settings.aggregate_store_path or os.path.join(sink_dir(settings), ".aggregates.sqlite")
+    store = AggregateStore(store_path)
+    if args.backfill:
+        from src.analysis.loader import load_json
+
+        # Every country, year and month directory found in the JSON output
+        countries = [name.split(":", 1)[1] for name in os.listdir(settings.output_dir) if name.startswith("sourcecountry:")]
+        if args.countries:
+            selected = {source_country(code) for code in args.countries}
+            countries = [code for code in countries if source_country(code) in selected]
+        years = sorted({year for code in countries for year in os.listdir(os.path.join(settings.output_dir, source_country(code)))})
+        store.backfill(load_json(settings.output_dir, countries, years, [str(month) for month in range(1, 13)],
+                                 columns=["source_country", "start_datetime", "bin", "count"]))
+    frame = {"weekly": store.weekly, "monthly": store.monthly, "yearly": store.yearly}[args.freq]()
+    store.close()
+    if frame.empty:
+        sys.exit(f"No aggregates in {store_path}; run `python -m src aggregate --backfill` to seed it "
+                 f"from the JSON output in {settings.output_dir}")
+    if args.countries:
+        frame = frame[frame["source_country"].isin([code.replace("sourcecountry:", "") for code in args.countries])]
+    if args.output:
+        frame.to_csv(args.output, index=False)
+    else:
+        print(frame.to_string(index=False))
+
+
+def bench(args: argparse.Namespace):
+    import runpy
+
+    # The benchmark parses its own arguments, as if run with python -m src.bench.<name>
+    sys.argv = [f"src.bench.{args.benchmark}", *args.arguments]
+    runpy.run_module(f"src.bench.{args.benchmark}", run_name="__main__", alter_sys=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src", description="Fetch, scrape and aggregate GDELT tone data.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_settings(command: argparse.ArgumentParser):
+        command.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                             help="Override a setting of src/settings.py, e.g. --set num_parse_workers=8")
+        # Invalid settings are reported as usage errors of the command
+        command.set_defaults(parser=command)
+
+    def add_selection(command: argparse.ArgumentParser, countries_help: str):
+        command.add_argument("countries", nargs="*", metavar="COUNTRY", help=countries_help)
+        command.add_argument("--start", type=datetime.fromisoformat, help="Start date, e.g. 2018-01-01")
+        command.add_argument("--end", type=datetime.fromisoformat, help="End date (exclusive)")
+        command.add_argument("--range", type=date_range, action="append", default=[], metavar="START:END",
+                             help="A date range to fetch, repeat for several; replaces --start/--end")
+        command.add_argument("--workers", type=int, default=0,
+                             help="Run as coordinator with this many local worker processes (more can join with `worker`)")
+        add_settings(command)
+
+    add_selection(commands.add_parser("fetch", help="Plan and run the tasks of countries and date ranges"),
+                  "Source country codes (e.g. US GM), the configured countries if omitted")
+    add_selection(commands.add_parser("resume", help="Run the unfinished tasks already in the ledger"),
+                  "Only resume tasks of these countries")
+    add_settings(commands.add_parser("worker", help="Work on the tasks of a coordinator sharing the ledger"))
+
+    aggregate_parser = commands.add_parser("aggregate", help="Print or export the weighted-tone aggregates")
+    aggregate_parser.add_argument("countries", nargs="*", metavar="COUNTRY", help="Only these country codes")
+    aggregate_parser.add_argument("--freq", choices=["weekly", "monthly", "yearly"], default="weekly")
+    aggregate_parser.add_argument("--output", help="Write CSV to this file instead of printing")
+    aggregate_parser.add_argument("--backfill", action="store_true",
+                                  help="Seed the store from the JSON output first, e.g. output written before it existed")
+    add_settings(aggregate_parser)
+
+    bench_parser = commands.add_parser("bench", help="Run a benchmark of src/bench")
+    bench_parser.add_argument("benchmark", choices=BENCHMARKS)
+    bench_parser.add_argument("arguments", nargs=argparse.REMAINDER, help="Arguments of the benchmark")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    # `python -m src.main US` from before the commands existed means fetch
+    if argv and argv[0] not in COMMANDS and argv[0] not in ("-h", "--help"):
+        argv = ["fetch", *argv]
+    args = build_parser().parse_args(argv)
+    {"fetch": fetch, "resume": fetch, "worker": worker, "aggregate": aggregate, "bench": bench}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
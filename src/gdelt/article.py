@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field, field_serializer, field_validator
+from typing import Annotated, List, Literal, Optional, Union
+from pydantic import BaseModel, Field, TypeAdapter, field_serializer, field_validator
 
 from src.gdelt.responses import GDELTArticle
 
@@ -23,6 +23,8 @@ class Article(GDELTArticle):
 
     @field_validator("start_datetime", "end_datetime", mode="before")
     def serialize_seen_date(cls, value: str) -> datetime:
+        if isinstance(value, datetime):
+            return value
         return datetime.strptime(value, '%Y%m%d%H%M%S')
 
 class ArticleList(BaseModel):
@@ -51,6 +53,44 @@ class ToneChart(BaseModel):
 
     @field_validator("start_datetime", "end_datetime", mode="before")
     def serialize_seen_date(cls, value: str) -> datetime:
+        if isinstance(value, datetime):
+            return value
         return datetime.strptime(value, '%Y%m%d%H%M%S')
-    
 
+
+# --- Streaming output records ---
+# The pipeline writes one line per record instead of one line per ToneChart, so a
+# chart never has to be held in memory as a whole.
+
+class ArticleRecord(Article):
+    record: Literal["article"] = Field("article", description="Record type discriminator")
+    story: Optional[str] = Field(None, description="URL of the first copy of the article's story, see src/pipeline/near_duplicates.py")
+
+
+class ToneChartBinSummary(BaseModel):
+    bin: int = Field(..., validation_alias ="bin", description="Bin number")
+    count: int = Field(..., validation_alias ="count", description="Count of articles in the bin")
+
+
+class ToneChartSummary(BaseModel):
+    record: Literal["tonechart"] = Field("tonechart", description="Record type discriminator")
+    bins: List[ToneChartBinSummary] = Field(..., validation_alias ="bins", description="Article count of every bin")
+    source_country: str = Field(..., alias="source_country", description="Source country of the tone chart")
+    start_datetime: datetime = Field(..., alias="start_datetime", description="Start datetime of the tone chart")
+    end_datetime: datetime = Field(..., alias="end_datetime", description="End datetime of the tone chart")
+
+    @field_serializer("start_datetime", "end_datetime", mode="plain")
+    def serialize_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        if value is None:
+            return None
+        return value.strftime("%Y%m%d%H%M%S")
+
+    @field_validator("start_datetime", "end_datetime", mode="before")
+    def serialize_seen_date(cls, value: str) -> datetime:
+        if isinstance(value, datetime):
+            return value
+        return datetime.strptime(value, '%Y%m%d%H%M%S')
+
+
+OutputRecord = Annotated[Union[ArticleRecord, ToneChartSummary], Field(discriminator="record")]
+output_record_adapter = TypeAdapter(OutputRecord)
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Optional
+
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def expiry_for_window(end_datetime: datetime, ttl: float, settle_period: float) -> Optional[float]:
+    """
+    Expiry timestamp for a response covering a window that ends at end_datetime (UTC).
+    Windows that closed more than settle_period seconds ago are historical and never expire,
+    windows touching "now" may still change and expire after ttl seconds.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if end_datetime + timedelta(seconds=settle_period) <= now:
+        return None
+    return time.time() + ttl
+
+
+class ResponseCache(ABC):
+    """
+    Cache of raw GDELT API responses keyed by a hash of the request URL.
+    """
+
+    @abstractmethod
+    def get(self, url: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, url: str, body: bytes, expires_at: Optional[float] = None):
+        ...
+
+    def close(self):
+        pass
+
+
+class SQLiteResponseCache(ResponseCache):
+    __connection: sqlite3.Connection
+    __lock: Lock
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                expires_at REAL
+            )
+            """
+        )
+        self.__connection.commit()
+
+    def get(self, url: str) -> Optional[bytes]:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT body, expires_at FROM responses WHERE key = ?", (cache_key(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        body, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return gzip.decompress(body)
+
+    def set(self, url: str, body: bytes, expires_at: Optional[float] = None):
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO responses (key, url, body, fetched_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (cache_key(url), url, gzip.compress(body), time.time(), expires_at)
+            )
+            self.__connection.commit()
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+
+class FileResponseCache(ResponseCache):
+    """
+    One gzipped file per response under <cache_dir>/<key[:2]>/<key>.gz: a JSON header line
+    with the URL and expiry, followed by the raw response body.
+    """
+    __cache_dir: str
+
+    def __init__(self, cache_dir: str):
+        self.__cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __path(self, url: str) -> str:
+        key = cache_key(url)
+        return os.path.join(self.__cache_dir, key[:2], f"{key}.gz")
+
+    def get(self, url: str) -> Optional[bytes]:
+        path = self.__path(url)
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rb") as file:
+            header = json.loads(file.readline())
+            if header["expires_at"] is not None and header["expires_at"] < time.time():
+                return None
+            return file.read()
+
+    def set(self, url: str, body: bytes, expires_at: Optional[float] = None):
+        path = self.__path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        header = {"url": url, "fetched_at": time.time(), "expires_at": expires_at}
+        with gzip.open(tmp_path, "wb") as file:
+            file.write(json.dumps(header).encode("utf-8") + b"\n")
+            file.write(body)
+        os.replace(tmp_path, path)
+
+
+def create_response_cache(backend: str, path: str) -> Optional[ResponseCache]:
+    if backend == "sqlite":
+        return SQLiteResponseCache(path)
+    if backend == "files":
+        return FileResponseCache(path)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown GDELT response cache backend: {backend}")
@@ -1,17 +1,37 @@
+import asyncio
 from datetime import datetime
-import re
+from typing import TYPE_CHECKING, Callable, List, Optional, TypeVar
 from loguru import logger
-import requests
+from src.gdelt.cache import ResponseCache, expiry_for_window
+from src.gdelt.decoding import ToneChartBinRecord, decode_json, decode_tonechart_records
 from src.gdelt.responses import ArticleListResponse, ToneChartResponse
 from src.gdelt.query_params import GDELTMode, GDELTQuery, GDELTRequestParams, OutputFormat
+from src.utils.async_requests import AsyncFetcher
+from src.utils.rate_limit import RequestScheduler, ThrottledError
+
+if TYPE_CHECKING:
+    # Only the synchronous client uses requests, and only through the session it is given
+    import requests
+
+T = TypeVar("T")
+
 
 class GDELTClient:
     __base_url: str
-    __session: requests.Session
+    __session: "requests.Session"
+    __cache: Optional[ResponseCache]
+    __cache_ttl: float
+    __cache_settle_period: float
+    __timeout: float
 
-    def __init__(self, base_url: str, session: requests.Session):
+    def __init__(self, base_url: str, session: "requests.Session", cache: Optional[ResponseCache] = None,
+                 cache_ttl: float = 3600, cache_settle_period: float = 86400, timeout: float = 30):
         self.__base_url = base_url
         self.__session = session
+        self.__timeout = timeout
+        self.__cache = cache
+        self.__cache_ttl = cache_ttl
+        self.__cache_settle_period = cache_settle_period
 
     def fetch_artlist_json_results(self, query: GDELTQuery, max_records: int, start_datetime: datetime, end_datetime: datetime) -> ArticleListResponse:
         request_params = GDELTRequestParams(
@@ -24,39 +44,105 @@ class GDELTClient:
         )
         url = request_params.build_url(self.__base_url)
         print(url)
-        response = self.__session.get(url)
+        response = self.__session.get(url, timeout=self.__timeout)
         response.raise_for_status()
         return ArticleListResponse.model_validate_json(response.content)
     
-    def fetch_tonechart_json_results(self, query: GDELTQuery, start_datetime: datetime, end_datetime: datetime) -> ArticleListResponse:
-        request_params = GDELTRequestParams(
-            query=query,
-            mode=GDELTMode.TONE_CHART,
-            output_format=OutputFormat.JSON,
-            start_datetime=start_datetime,
-            end_datetime=end_datetime
-        )
-        url = request_params.build_url(self.__base_url)
-        response = self.__session.get(url)
+    def fetch_tonechart_json_results(self, query: GDELTQuery, start_datetime: datetime, end_datetime: datetime) -> ToneChartResponse:
+        return self.__fetch_tonechart(query, start_datetime, end_datetime, parse_tonechart_response)
+
+    def fetch_tonechart_records(self, query: GDELTQuery, start_datetime: datetime, end_datetime: datetime) -> List[ToneChartBinRecord]:
+        return self.__fetch_tonechart(query, start_datetime, end_datetime, parse_tonechart_records)
+
+    def __fetch_tonechart(self, query: GDELTQuery, start_datetime: datetime, end_datetime: datetime, parse: Callable[[bytes], T]) -> T:
+        url = build_tonechart_url(self.__base_url, query, start_datetime, end_datetime)
+        if self.__cache is not None:
+            body = self.__cache.get(url)
+            if body is not None:
+                return parse(body)
+
+        response = self.__session.get(url, timeout=self.__timeout)
         response.raise_for_status()
-        try:
-            # clean_response = clean_json_string(response.content.decode('utf-8'))
-            res = ToneChartResponse.model_validate_json(clean_json_string(response.text))
-            return res
-        except Exception as e:
-            logger.error(f"Invalid json response: {response.text}")
-            raise e
-    
+        result = parse(response.content)
+        if self.__cache is not None:
+            # Only cache responses that parsed
+            expires_at = expiry_for_window(end_datetime, self.__cache_ttl, self.__cache_settle_period)
+            self.__cache.set(url, response.content, expires_at)
+        return result
 
-def clean_json_string(json_content):
-    # Fix unescaped backslashes
-    json_content = re.sub(r'\\(?![/u"\\bfnrt])', r'\\\\', json_content)
 
-    # Replace invalid escape sequences
-    json_content = json_content.replace('\\\'', '\'')  # Single quotes don't need to be escaped
-    json_content = json_content.replace('\\"', '"')    # Properly escape double quotes
+class AsyncGDELTClient:
+    __base_url: str
+    __fetcher: AsyncFetcher
+    __timeout: float
+    __cache: Optional[ResponseCache]
+    __cache_ttl: float
+    __cache_settle_period: float
+    __scheduler: Optional[RequestScheduler]
 
-    # Replace control characters within strings
-    json_content = re.sub(r'[\x00-\x1f\x7f-\x9f]', lambda x: f'\\u{ord(x.group(0)):04x}', json_content)
-    
-    return json_content
+    def __init__(self, base_url: str, fetcher: AsyncFetcher, timeout: float = 30, cache: Optional[ResponseCache] = None,
+                 cache_ttl: float = 3600, cache_settle_period: float = 86400, scheduler: Optional[RequestScheduler] = None):
+        self.__base_url = base_url
+        self.__fetcher = fetcher
+        self.__scheduler = scheduler
+        self.__timeout = timeout
+        self.__cache = cache
+        self.__cache_ttl = cache_ttl
+        self.__cache_settle_period = cache_settle_period
+
+    async def fetch_tonechart_json_results(self, query: GDELTQuery, start_datetime: datetime, end_datetime: datetime) -> ToneChartResponse:
+        return await self.__fetch_tonechart(query, start_datetime, end_datetime, parse_tonechart_response)
+
+    async def fetch_tonechart_records(self, query: GDELTQuery, start_datetime: datetime, end_datetime: datetime) -> List[ToneChartBinRecord]:
+        """
+        Like fetch_tonechart_json_results, but returns plain tuples instead of pydantic models.
+        """
+        return await self.__fetch_tonechart(query, start_datetime, end_datetime, parse_tonechart_records)
+
+    async def __fetch_tonechart(self, query: GDELTQuery, start_datetime: datetime, end_datetime: datetime, parse: Callable[[bytes], T]) -> T:
+        url = build_tonechart_url(self.__base_url, query, start_datetime, end_datetime)
+        if self.__cache is not None:
+            body = await asyncio.to_thread(self.__cache.get, url)
+            if body is not None:
+                return parse(body)
+
+        async def request() -> bytes:
+            body = await self.__fetcher.fetch_bytes(url, self.__timeout)
+            if not body.lstrip().startswith(b"{") and b"limit requests" in body.lower():
+                raise ThrottledError(body.strip()[:200].decode("utf-8", errors="replace"))
+            return body
+
+        body = await self.__scheduler.run(request) if self.__scheduler is not None else await request()
+        result = parse(body)
+        if self.__cache is not None:
+            # Only cache responses that parsed
+            expires_at = expiry_for_window(end_datetime, self.__cache_ttl, self.__cache_settle_period)
+            await asyncio.to_thread(self.__cache.set, url, body, expires_at)
+        return result
+
+
+def build_tonechart_url(base_url: str, query: GDELTQuery, start_datetime: datetime, end_datetime: datetime) -> str:
+    request_params = GDELTRequestParams(
+        query=query,
+        mode=GDELTMode.TONE_CHART,
+        output_format=OutputFormat.JSON,
+        start_datetime=start_datetime,
+        end_datetime=end_datetime
+    )
+    return request_params.build_url(base_url)
+
+
+def parse_tonechart_response(body: bytes) -> ToneChartResponse:
+    try:
+        return ToneChartResponse.model_validate(decode_json(body))
+    except Exception as e:
+        logger.error(f"Invalid json response: {body[:1000]}")
+        raise e
+
+
+def parse_tonechart_records(body: bytes) -> List[ToneChartBinRecord]:
+    try:
+        return decode_tonechart_records(body)
+    except Exception as e:
+        logger.error(f"Invalid json response: {body[:1000]}")
+        raise e
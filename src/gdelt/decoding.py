@@ -0,0 +1,82 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+import orjson
+
+# Record boundaries in a tonechart response, used to confine repairs to the broken record
+RECORD_START = re.compile(rb'\{\s*"(?:url|bin)"')
+MAX_REPAIRS = 100
+
+
+class ToneChartBinRecord(NamedTuple):
+    """
+    Lightweight alternative to GDELTToneChartBin: (bin, count, [(url, title), ...]).
+    """
+    bin: int
+    count: int
+    top_articles: List[Tuple[str, str]]
+
+
+def clean_json_string(json_content):
+    # Fix unescaped backslashes
+    json_content = re.sub(r'\\(?![/u"\\bfnrt])', r'\\\\', json_content)
+
+    # Replace invalid escape sequences
+    json_content = json_content.replace('\\\'', '\'')  # Single quotes don't need to be escaped
+    json_content = json_content.replace('\\"', '"')    # Properly escape double quotes
+
+    # Replace control characters within strings
+    json_content = re.sub(r'[\x00-\x1f\x7f-\x9f]', lambda x: f'\\u{ord(x.group(0)):04x}', json_content)
+
+    return json_content
+
+
+def _record_range(raw: bytes, position: int) -> Tuple[int, int]:
+    """
+    Byte range of the tonechart record (a bin header or a top article) containing position.
+    """
+    start = 0
+    for match in RECORD_START.finditer(raw, 0, position + 1):
+        start = match.start()
+    following = RECORD_START.search(raw, position + 1)
+    end = following.start() if following else len(raw)
+    return start, end
+
+
+def _repair(raw: bytes, start: int, end: int) -> bytes:
+    text = raw[start:end].decode("utf-8", errors="replace")
+    return raw[:start] + clean_json_string(text).encode("utf-8") + raw[end:]
+
+
+def decode_json(raw: Union[bytes, str]) -> dict:
+    """
+    Parse a GDELT response with orjson. Only when strict parsing fails is the regex cleanup run,
+    and then only on the record around the failure; the whole document is cleaned as a last resort.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8", errors="replace")
+    last_position: Optional[int] = None
+    for _ in range(MAX_REPAIRS):
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            # pos counts characters, the records are located in the bytes
+            position = len(raw.decode("utf-8", errors="replace")[:e.pos].encode("utf-8"))
+        if position == last_position:
+            break
+        last_position = position
+        start, end = _record_range(raw, position)
+        raw = _repair(raw, start, end)
+    return orjson.loads(clean_json_string(raw.decode("utf-8", errors="replace")))
+
+
+def decode_tonechart_records(raw: Union[bytes, str]) -> List[ToneChartBinRecord]:
+    data = decode_json(raw)
+    return [
+        ToneChartBinRecord(
+            int(bin["bin"]),
+            int(bin["count"]),
+            [(article["url"], article["title"]) for article in bin.get("toparts", [])]
+        )
+        for bin in data.get("tonechart", [])
+    ]
@@ -99,7 +99,8 @@ class GDELTRequestParams(BaseModel):
         return value.strftime("%Y%m%d%H%M%S")
 
     def build_url(self, base_url: str) -> str:
-        query_dict = self.model_dump(exclude_unset=True, by_alias=True)
+        # mode="json" renders enums by value, f-strings would give "GDELTMode.TONE_CHART" on Python 3.11+
+        query_dict = self.model_dump(exclude_unset=True, by_alias=True, mode="json")
         query_dict['query'] = self.query.build()
         query_str = "&".join([f"{key}={value}" for key, value in query_dict.items()])
         query_str = f"{base_url}?{query_str}"
@@ -1,26 +1,39 @@
-import json
-from multiprocessing import cpu_count
+import asyncio
+import multiprocessing
 import os
+import shutil
 import threading
-from queue import Queue
+import time
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-from threading import Lock
-from typing import List, Dict, Tuple
-import requests
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 from loguru import logger
 
 # --- Imports from your project (adjust these as needed) ---
-from src.gdelt.responses import GDELTToneChartBin, ToneChartResponse
-# from src.gdelt.tonechart import ToneChart
 from src.settings import Settings
-from src.gdelt.client import GDELTClient
-from src.gdelt.article import Article, ArticleList, ToneChartBin, ToneChart
+from src.gdelt.cache import create_response_cache
+from src.gdelt.client import AsyncGDELTClient
+from src.gdelt.article import ToneChartBinSummary, ToneChartSummary
 from src.gdelt.query_params import GDELTQuery
-from src.parsers.body_parser import BodyParser
-from src.parsers.title_parser import TitleParser
-from src.utils.requests import create_session, fetch_html
-import argparse
+from src.parsers.article_parser import ArticleParser
+from src.analysis.aggregate_store import AggregateStore
+from src.pipeline.dedup import URLDeduplicator
+from src.pipeline.distributed import TaskSource, worker_name
+from src.pipeline.ledger import TaskLedger
+from src.pipeline.metrics import API, ARTICLES, PARSE, exporting, register_run_metrics, track
+from src.pipeline.near_duplicates import StoryIndex, minhash
+from src.pipeline.records import CompactArticle, to_timestamp
+from src.pipeline.sinks import (
+    OutputSink, RecordWriter, TaskEnd, create_sink, recover_expired_tasks, recover_interrupted_tasks, write_records
+)
+from src.pipeline.windows import VolumeProfile, WindowPlanner
+from src.gdelt.decoding import ToneChartBinRecord
+from src.utils.async_requests import AsyncFetcher, create_async_session
+from src.utils.host_scheduler import HostScheduler
+from src.utils.html_cache import HTMLCache
+from src.utils.rate_limit import AdaptiveRateLimiter, CircuitBreaker, GlobalRateBudget, RequestScheduler
+
+DateRange = Tuple[datetime, datetime]
 
 # --- Utility: generate date intervals ---
 def generate_date_intervals(start: datetime, end: datetime, delta: timedelta) -> List[tuple]:
@@ -33,66 +46,101 @@ def generate_date_intervals(start: datetime, end: datetime, delta: timedelta) ->
     return intervals
 
 # --- Stage 1 helper: fetch article lists ---
-def fetch_tonechart_for_query(query: GDELTQuery, start_dt: datetime, end_dt: datetime) -> ToneChartResponse:
-    logger.debug(f"Thread {threading.current_thread().name} is in stage 1")
-    response = client.fetch_tonechart_json_results(
-        query=query, start_datetime=start_dt, end_datetime=end_dt
-    )
+async def fetch_tonechart_for_query(query: GDELTQuery, start_dt: datetime, end_dt: datetime,
+                                    client: AsyncGDELTClient) -> List[ToneChartBinRecord]:
+    logger.debug(f"Task {query.source_country} {start_dt} is in stage 1")
+    # Plain tuples: the response is only validated once, into the records that are written out
+    with track(API):
+        return await client.fetch_tonechart_records(
+            query=query, start_datetime=start_dt, end_datetime=end_dt
+        )
+
+
+async def process_tonechart(query: GDELTQuery, start_dt: datetime, end_dt: datetime, tonechart: List[ToneChartBinRecord],
+                            fetcher: AsyncFetcher, parse_executor: ProcessPoolExecutor, dedup: URLDeduplicator,
+                            stories: Optional[StoryIndex], collapse: bool, write_queue: asyncio.Queue, task_id: str) -> int:
+    """
+    Stream every article of one tonechart window to the writer as soon as it is parsed.
+    Returns the number of articles written.
+    """
+    # Chart-level metadata goes out as its own record, ahead of the articles
+    await write_queue.put((task_id, ToneChartSummary(
+        bins=[ToneChartBinSummary(bin=bin.bin, count=bin.count) for bin in tonechart],
+        source_country=query.source_country,
+        start_datetime=start_dt,
+        end_datetime=end_dt
+    )))
+
+    logger.debug(f"Task {query.source_country} {start_dt} is processing tonechart")
+    start_timestamp, end_timestamp = to_timestamp(start_dt), to_timestamp(end_dt)
+    jobs = []
+    for bin in tonechart:
+        for url, title in bin.top_articles:
+            article = CompactArticle(url, title, bin.bin, start_timestamp, end_timestamp, query.source_country)
+            jobs.append(process_article(article, fetcher, parse_executor, dedup, stories, collapse, write_queue, task_id))
+
+    results = await asyncio.gather(*jobs)
+    return sum(results)
 
-    futures = []
-    bins = {}
-
-    logger.debug(f"Thread {threading.current_thread().name} is processing tonechart")
-    # {"1": {"count": 12, "top_articles": []}}6
-
-    with ThreadPoolExecutor(max_workers=settings.num_threads_api) as thread_executor, \
-         ProcessPoolExecutor(max_workers=5) as process_executor:
-        for bin in response.tonechart:
-            bins[bin.bin] = {"count": bin.count, "top_articles": []}
-            for ta in bin.top_articles:
-                article = Article(**ta.model_dump(), startdatetime=start_dt, enddatetime=end_dt, sourcecountry=query.source_country, tone=bin.bin)
-                futures.append(thread_executor.submit(fetch_html_for_article, article))
-        
-        for future in as_completed(futures):
-            try:
-                article = future.result()
-            except Exception as e:
-                logger.error(f"Error fetching HTML for {article.url}: {e}")
-
-        futures2 = []
-        for future in as_completed(futures):
-            try:
-                article = future.result()
-                futures2.append(process_executor.submit(parse_html_for_article, article))
-            except Exception as e:
-                logger.error(f"Error fetching HTML for {article.url}: {e}")
-        
-        for future in as_completed(futures2):
-            try:
-                article = future.result()
-                bins[article.gdelt_tone]["top_articles"].append(article)
-            except Exception as e:
-                logger.error(f"Error parsing HTML for {article.url}: {e}")
-    
+
+async def process_article(article: CompactArticle, fetcher: AsyncFetcher, parse_executor: ProcessPoolExecutor,
+                          dedup: URLDeduplicator, stories: Optional[StoryIndex], collapse: bool, write_queue: asyncio.Queue,
+                          task_id: str) -> bool:
+    """
+    Fetch, parse and hand one article to the writer. The article is not referenced
+    by the caller, so its text is released as soon as it has been written.
+    """
     try:
-        logger.debug(f"Thread {threading.current_thread().name} is updating bins")
-        updated_bins = []
-        for bin in bins:
-            updated_bins.append(ToneChartBin(bin=bin, count=bins[bin]["count"], toparts=bins[bin]["top_articles"]))
-        logger.debug(f"Thread {threading.current_thread().name} is creating tonechart")
-        tonechart = ToneChart(tonechart=updated_bins, source_country=query.source_country, startdatetime=start_dt, enddatetime=end_dt)
-        return tonechart
+        # Every bin and window listing the same article shares one download and parse
+        article.html_title, article.html_body, article.story = await dedup.run(
+            article.url, lambda: extract_story(article, fetcher, parse_executor, stories, collapse)
+        )
     except Exception as e:
-        logger.error(f"Error updating bins: {e}")
-        raise e
+        logger.error(f"Error processing {article.url}: {e}")
+        ARTICLES.labels(status="failed").inc()
+        return False
+    await write_queue.put((task_id, article))
+    ARTICLES.labels(status="written").inc()
+    return True
+
+
+async def extract_story(article: CompactArticle, fetcher: AsyncFetcher, parse_executor: ProcessPoolExecutor,
+                        stories: Optional[StoryIndex], collapse: bool) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Title, body and story of an article. With collapse, the copies of a story keep neither title
+    nor body, and copies the index already knows of are not downloaded again.
+    """
+    if stories is None:
+        return (*await extract_article(article, fetcher, parse_executor), None)
+    story = await asyncio.to_thread(stories.lookup, article.url)
+    if collapse and story is not None and story.copy:
+        stories.stats.skipped += 1
+        return None, None, story.url
+    title, body = await extract_article(article, fetcher, parse_executor)
+    if story is None:
+        # Hashed in the parse pool, only the body crosses the process boundary again
+        signature = await asyncio.get_running_loop().run_in_executor(parse_executor, minhash, body, stories.num_perm)
+        story = await asyncio.to_thread(stories.add, article.url, signature)
+    if collapse and story.copy:
+        return None, None, story.url
+    return title, body, story.url
+
+
+async def extract_article(article: CompactArticle, fetcher: AsyncFetcher, parse_executor: ProcessPoolExecutor) -> Tuple[Optional[str], Optional[str]]:
+    html = await fetch_html_for_article(article, fetcher)
+    loop = asyncio.get_running_loop()
+    # Only the HTML crosses the process boundary, and only the extracted text comes back.
+    # The parse time includes waiting for a free worker, see pipeline_stage_in_flight.
+    with track(PARSE):
+        return await loop.run_in_executor(parse_executor, parse_html_for_article, html)
 
 # --- Stage 2 helper: fetch HTML for one article ---
 
-def fetch_html_for_article(article: Article, timeout: int = 5) -> Article:
+async def fetch_html_for_article(article: CompactArticle, fetcher: AsyncFetcher) -> str:
     try:
-        logger.debug(f"Thread {threading.current_thread().name} Article {article.url}")
-        article.html = fetch_html(article.url, session, timeout) 
-        return article
+        logger.debug(f"Fetching article {article.url}")
+        # Timed by the fetcher, which leaves out the wait for a host slot
+        return await fetcher.fetch_html(article.url)
     except Exception as e:
         logger.error(e)
         raise e
@@ -100,95 +148,294 @@ def fetch_html_for_article(article: Article, timeout: int = 5) -> Article:
 
 
 # --- Stage 3 helper: parse HTML for one article (CPU-bound) ---
-def parse_html_for_article(article: Article) -> Article:
+def parse_html_for_article(html: str) -> Tuple[Optional[str], Optional[str]]:
     logger.debug(f"Thread {threading.current_thread().name} with PID {os.getpid()} is in stage 3")
     try:
-        body_parser = BodyParser()
-        title_parser = TitleParser()
-        article.html_body = body_parser.parse(article.html)
-        article.html_title = title_parser.parse(article.html)
-        article.html = None  # Clear HTML content after parsing
-        return article
+        # One lxml parse yields both, BodyParser/TitleParser would each build a BeautifulSoup tree
+        return ArticleParser.parse(html)
     except Exception as e:
         logger.error(e)
         raise e
 
-# --- Stage 4: Writer thread that saves articles to disk ---
+# --- Stage 4: the writer drains the record queue into the sink (see src/pipeline/sinks.py) ---
+
+
+async def run_task(task: dict, settings: Settings, client: AsyncGDELTClient, fetcher: AsyncFetcher, parse_executor: ProcessPoolExecutor,
+                   dedup: URLDeduplicator, stories: Optional[StoryIndex], write_queue: asyncio.Queue, ledger: TaskLedger,
+                   planner: Optional[WindowPlanner] = None) -> List[dict]:
+    """
+    Fetch and write one window. Returns the tasks that replace it if the planner bisected it instead.
+    """
+    query = GDELTQuery(
+        query=settings.query,
+        source_country=task["country"],
+        theme=settings.theme
+    )
+    ledger.mark_running(task["task_id"])
+    try:
+        tonechart = await fetch_tonechart_for_query(query, task["start_date"], task["end_date"], client)
+        windows = planner.observe(task["country"], task["start_date"], task["end_date"], tonechart) if planner is not None else []
+        if windows:
+            # Nothing was queued for this task yet, its windows are written as tasks of their own
+            logger.debug(f"Task {task['task_id']} lists too few of its articles, split into {len(windows)} windows")
+            return ledger.split(task["task_id"], task["country"], windows)
+        written = await process_tonechart(
+            query, task["start_date"], task["end_date"], tonechart, fetcher, parse_executor, dedup, stories,
+            settings.near_duplicates == "collapse", write_queue, task["task_id"]
+        )
+    except Exception as e:
+        # The writer discards whatever the task spooled and records the failure
+        await write_queue.put((task["task_id"], TaskEnd(False, f"{type(e).__name__}: {e}")))
+        raise e
+    await write_queue.put((task["task_id"], TaskEnd(True)))
+    logger.debug(f"Task {task['task_id']} wrote {written} articles")
+    return []
+
+
+async def run_pipeline(settings: Settings, tasks: List[dict], ledger: TaskLedger, record_writer: RecordWriter,
+                       planner: Optional[WindowPlanner] = None, source: Optional[TaskSource] = None):
+    """
+    Run the given tasks, or the tasks claimed from source until none are left when running as a worker.
+    """
+    async with create_async_session(settings.max_concurrent_requests, settings.max_requests_per_host, settings.request_timeout) as session:
+        cache = HTMLCache(settings.html_cache_dir, settings.html_cache_max_bytes, settings.html_cache_max_age) if settings.html_cache_enabled else None
+        host_scheduler = HostScheduler(settings.max_concurrent_requests, settings.max_requests_per_host, settings.host_slow_latency,
+                                       settings.host_failure_threshold, settings.host_failure_cooldown)
+        fetcher = AsyncFetcher(session, host_scheduler, cache)
+        response_cache = create_response_cache(settings.gdelt_cache_backend, settings.gdelt_cache_path)
+        budget = GlobalRateBudget(settings.gdelt_rate_budget_path, settings.gdelt_global_requests_per_second) \
+            if settings.gdelt_global_requests_per_second else None
+        scheduler = RequestScheduler(
+            AdaptiveRateLimiter(settings.gdelt_requests_per_second, settings.gdelt_min_requests_per_second, settings.gdelt_max_requests_per_second),
+            CircuitBreaker(settings.gdelt_breaker_threshold, settings.gdelt_breaker_cooldown),
+            settings.gdelt_max_retries, settings.gdelt_backoff_base, settings.gdelt_backoff_max, budget
+        )
+        client = AsyncGDELTClient(settings.gdelt_doc_base_url, fetcher, settings.api_timeout, response_cache,
+                                  settings.gdelt_cache_ttl, settings.gdelt_cache_settle_period, scheduler)
+        dedup = URLDeduplicator(settings.dedup_max_entries)
+        stories = open_story_index(settings)
+        task_limit = asyncio.Semaphore(settings.max_concurrent_tasks)
+        # Bounded, so a slow disk applies back-pressure instead of piling up records
+        write_queue = asyncio.Queue(maxsize=settings.write_queue_size)
+        writer = asyncio.create_task(write_records(write_queue, record_writer))
+        register_run_metrics(fetcher, cache, dedup, write_queue, stories)
+
+        async with exporting(settings.metrics_snapshot_path, settings.metrics_snapshot_interval, settings.metrics_port,
+                             settings.profile_path, settings.profile_interval):
+            # A single worker pool shared by every task handles the CPU-bound parsing
+            with ProcessPoolExecutor(max_workers=settings.num_parse_workers) as parse_executor:
+                async def run_limited(task: dict):
+                    async with task_limit:
+                        try:
+                            replacements = await run_task(task, settings, client, fetcher, parse_executor, dedup, stories,
+                                                             write_queue, ledger, planner)
+                        except Exception as e:
+                            logger.error(f"Task {task['task_id']} failed: {e}")
+                            return
+                    # Outside the limit, the bisected windows queue up like any other task
+                    await asyncio.gather(*(run_limited(replacement) for replacement in replacements))
+
+                if source is None:
+                    await asyncio.gather(*(run_limited(task) for task in tasks))
+                else:
+                    await source.run(run_limited, settings.max_concurrent_tasks)
+
+            await write_queue.put(None)
+            await writer
+
+        logger.info(f"Deduplication: {dedup.stats.unique} unique articles, "
+                    f"{dedup.stats.duplicates} downloads and parses avoided")
+        if stories is not None:
+            logger.info(f"Near-duplicates: {stories.stats.stories} new stories, {stories.stats.copies} copies of one, "
+                        f"{stories.stats.unindexed} too short to compare, {stories.stats.skipped} known copies not downloaded")
+            stories.close()
+        hosts = host_scheduler.summary()
+        logger.info(f"Hosts: {hosts.hosts} contacted, {hosts.slow} slow, {hosts.cooling_down} cooling down, "
+                    f"{hosts.failures} of {hosts.requests} requests failed")
+        if cache is not None:
+            logger.info(f"HTML cache: {cache.stats.hits} hits, {cache.stats.revalidated} revalidated, "
+                        f"{cache.stats.misses} misses, {cache.stats.bytes_read} bytes read, "
+                        f"{cache.stats.bytes_written} bytes written, {cache.stats.evictions} evicted")
+            cache.close()
+        if response_cache is not None:
+            response_cache.close()
+        if budget is not None:
+            budget.close()
 
-# --- Global lock dictionary ---
-file_locks = {}
-file_locks_access = Lock()
 
-def get_file_lock(filename):
-    """Retrieve or create a lock for the given filename."""
-    with file_locks_access:
-        if filename not in file_locks:
-            file_locks[filename] = Lock()
-        return file_locks[filename]
 
-def write_article_to_file(tonechart: ToneChart, base_dir="output2"):
-    logger.debug(f"Thread {threading.current_thread().name} is writing")
-    path = f"{base_dir}/{tonechart.source_country}/{tonechart.start_datetime.year}"
-    if not os.path.exists(path):
-        os.makedirs(path)
-    filename = f"{path}/{tonechart.start_datetime.month}.json"
-    file_lock = get_file_lock(filename)
-    with file_lock:
-        logger.debug(f"Thread {threading.current_thread().name} is writing to {filename}")
-        with open(filename, "a") as file:
-            data = tonechart.model_dump(exclude_none=True)
-            file.write(json.dumps(data) + "\n")
 
+def sink_dir(settings: Settings) -> str:
+    return settings.parquet_output_dir if settings.output_sink == "parquet" else settings.output_dir
 
-settings = Settings()
-session = create_session(settings.num_threads_api)
-client = GDELTClient(settings.gdelt_doc_base_url, session)
+
+def open_ledger(settings: Settings, worker_id: Optional[str] = None) -> TaskLedger:
+    # Each sink keeps its own ledger, a window done as JSON still has to be written as Parquet
+    return TaskLedger(settings.ledger_path or os.path.join(sink_dir(settings), ".ledger.sqlite"), worker_id, settings.worker_lease_seconds)
+
+
+def open_sink(settings: Settings, spool_name: Optional[str] = None) -> OutputSink:
+    return create_sink(settings.output_sink, settings.output_dir, settings.parquet_output_dir, settings.parquet_row_group_size, spool_name)
+
+
+def open_store(settings: Settings) -> Optional[AggregateStore]:
+    return AggregateStore(settings.aggregate_store_path or os.path.join(sink_dir(settings), ".aggregates.sqlite")) if settings.aggregate_store_enabled else None
+
+
+def open_planner(settings: Settings) -> Tuple[Optional[VolumeProfile], Optional[WindowPlanner]]:
+    if not settings.adaptive_windows:
+        return None, None
+    profile = VolumeProfile(settings.window_profile_path)
+    planner = WindowPlanner(profile, timedelta(seconds=settings.window_initial), timedelta(seconds=settings.window_min),
+                            timedelta(seconds=settings.window_max), settings.window_min_coverage, settings.max_records)
+    return profile, planner
+
+
+def open_story_index(settings: Settings) -> Optional[StoryIndex]:
+    if settings.near_duplicates == "off":
+        return None
+    if settings.near_duplicates not in ("tag", "collapse"):
+        raise ValueError(f"Unknown near-duplicate mode: {settings.near_duplicates}")
+    return StoryIndex(settings.near_duplicate_index_path, settings.near_duplicate_bands, settings.near_duplicate_rows,
+                      settings.near_duplicate_threshold)
+
+
+def default_ranges(settings: Settings) -> List[DateRange]:
+    return [(settings.start_date, settings.end_date)]
+
+
+def plan_tasks(settings: Settings, ledger: TaskLedger, planner: Optional[WindowPlanner], countries: List[str], ranges: List[DateRange]):
+    """
+    Register the (country, window) tasks of the countries and date ranges in the ledger.
+    """
+    if planner is not None:
+        # Periods the ledger already has windows for keep them, a changed plan must not fetch them twice
+        ledger.add_tasks([
+            (country, start_dt, end_dt)
+            for country in countries
+            for range_start, range_end in ranges
+            for start_dt, end_dt in planner.plan_gaps(country, range_start, range_end, ledger.windows(country))
+        ])
+    else:
+        ledger.add_tasks([
+            (country, start_dt, end_dt)
+            for country in countries
+            for range_start, range_end in ranges
+            for start_dt, end_dt in generate_date_intervals(range_start, range_end, timedelta(seconds=settings.window_initial))
+        ])
+
+
+def select_tasks(tasks: List[dict], countries: Optional[List[str]], ranges: Optional[List[DateRange]]) -> List[dict]:
+    """
+    The tasks of the countries that lie within one of the date ranges; None selects them all.
+    """
+    return [
+        task for task in tasks
+        if (countries is None or task["country"] in countries)
+        and (ranges is None or any(start <= task["start_date"] and task["end_date"] <= end for start, end in ranges))
+    ]
 
 
 @logger.catch
-def main():
+def run_standalone(settings: Settings, countries: Optional[List[str]] = None, ranges: Optional[List[DateRange]] = None,
+                   plan: bool = True):
+    """
+    Run the unfinished tasks of the countries and date ranges in this process. With plan, their
+    windows are added to the ledger first, for settings.countries, settings.start_date and
+    settings.end_date unless given; without, only tasks already in the ledger are run.
+    """
     logger.info("Starting the pipeline")
-    delta = timedelta(weeks=1)
-    date_intervals = generate_date_intervals(settings.start_date, settings.end_date, delta)
+    sink = open_sink(settings)
+    ledger = open_ledger(settings)
+    store = open_store(settings)
+    # Roll back the half-written output of a crashed run before anything else is appended
+    recover_interrupted_tasks(ledger, sink)
 
-    tasks = []
-    for country in settings.countries:
-        for start_dt, end_dt in date_intervals:
-            tasks.append({
-                "country": country,
-                "start_date": start_dt,
-                "end_date": end_dt,
-                "base_query": settings.query,
-                "theme": settings.theme
-            })
+    profile, planner = open_planner(settings)
+    if plan:
+        countries, ranges = countries or settings.countries, ranges or default_ranges(settings)
+        plan_tasks(settings, ledger, planner, countries, ranges)
+    # Completed windows are skipped, failed ones are retried up to max_task_attempts
+    tasks = select_tasks(ledger.runnable_tasks(settings.max_task_attempts), countries, ranges)
+    logger.info(f"Starting {len(tasks)} tasks")
+    asyncio.run(run_pipeline(settings, tasks, ledger, RecordWriter(sink, ledger, store), planner))
+    logger.info(f"Finished processing all tasks: {ledger.summary()}")
+    ledger.close()
+    if profile is not None:
+        profile.close()
+    if store is not None:
+        store.close()
 
 
-    logger.info(f"Starting {len(tasks)} tasks")
+@logger.catch
+def run_worker(settings: Settings):
+    """
+    Claim tasks from the shared ledger and run them until none are left. Start any number of
+    these, on this host or others that see the same output directory, ledger and rate budget.
+    """
+    worker_id = worker_name()
+    logger.info(f"Starting worker {worker_id}")
+    sink = open_sink(settings, spool_name=worker_id)
+    ledger = open_ledger(settings, worker_id)
+    store = open_store(settings)
+    profile, planner = open_planner(settings)
+    source = TaskSource(ledger, settings.max_task_attempts, settings.worker_poll_interval, settings.worker_heartbeat_interval)
+    asyncio.run(run_pipeline(settings, [], ledger, RecordWriter(sink, ledger, store), planner, source))
+    ledger.close()
+    if profile is not None:
+        profile.close()
+    if store is not None:
+        store.close()
 
-    with ProcessPoolExecutor(max_workers=5) as process_executor:
-        for task in tasks:
-            query = GDELTQuery(
-                query=task["base_query"],
-                source_country=task["country"],
-                theme=task["theme"]
-            )
-            future = process_executor.submit(
-                fetch_tonechart_for_query,
-                query, task["start_date"], task["end_date"]
-            )
-            future.add_done_callback(lambda f: write_article_to_file(f.result()))
 
-    logger.info("Finished processing all tasks")
+def run_worker_process(settings_values: dict):
+    # Spawned workers start from a fresh interpreter and build their settings, clients and pools there
+    run_worker(Settings(**settings_values))
 
 
+@logger.catch
+def run_coordinator(settings: Settings, local_workers: int = 0, countries: Optional[List[str]] = None,
+                    ranges: Optional[List[DateRange]] = None, plan: bool = True):
+    """
+    Plan the tasks into the shared ledger, optionally start local workers, and hand the tasks of
+    workers that stop renewing their leases to the others until every task is finished.
+    Workers run every unfinished task of the ledger, whatever countries and ranges were planned.
+    """
+    logger.info("Starting the coordinator")
+    sink = open_sink(settings)
+    ledger = open_ledger(settings)
+    recover_interrupted_tasks(ledger, sink)
+    if plan:
+        profile, planner = open_planner(settings)
+        plan_tasks(settings, ledger, planner, countries or settings.countries, ranges or default_ranges(settings))
+        if profile is not None:
+            profile.close()
+
+    context = multiprocessing.get_context("spawn")
+    settings_values = settings.model_dump()
+    workers = [context.Process(target=run_worker_process, args=(settings_values,)) for _ in range(local_workers)]
+    for worker in workers:
+        worker.start()
+
+    while ledger.outstanding(settings.max_task_attempts):
+        recovered = recover_expired_tasks(ledger, sink, lambda worker_id: open_sink(settings, spool_name=worker_id))
+        if recovered:
+            logger.info(f"Recovered {recovered} tasks of unresponsive workers")
+        logger.info(f"Tasks: {ledger.summary()}")
+        time.sleep(settings.worker_heartbeat_interval)
+
+    for worker in workers:
+        worker.join()
+    # Spools left by workers that died are of no use once every task is finished
+    for name in os.listdir(os.path.join(sink_dir(settings), ".spool")):
+        if os.path.isdir(path := os.path.join(sink_dir(settings), ".spool", name)):
+            shutil.rmtree(path, ignore_errors=True)
+    logger.info(f"Finished processing all tasks: {ledger.summary()}")
+    ledger.close()
+
 
 if __name__ == "__main__":
-    def parse_arguments():
-        parser = argparse.ArgumentParser(description="Process GDELT data for a specific country.")
-        parser.add_argument("source_country", type=str, help="The source country to process data for")
-        return parser.parse_args()
-    
-    args = parse_arguments()
-    print(args.source_country)
-    settings.countries = [args.source_country]
-    main()
\ No newline at end of file
+    # Kept for `python -m src.main US`, see src/cli.py for the commands
+    from src.cli import main
+
+    main()
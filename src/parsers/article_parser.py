@@ -0,0 +1,134 @@
+from typing import Dict, Iterator, Optional, Tuple
+
+import lxml.html
+from lxml import etree
+
+# Text inside these tags is not article text (BeautifulSoup's get_text skips it as well)
+SKIPPED_TAGS = {"script", "style", "template"}
+ARTICLE_TAGS = {"article", "main"}
+BLOCK_TAGS = {"p", "div", "section"}
+COMMON_CLASSES = ['article-body', 'post-content', 'entry-content', 'story-body', 'blog-post']
+
+html_parser = lxml.html.HTMLParser(encoding="utf-8")
+
+
+def _is_skipped(element) -> bool:
+    # Comments and processing instructions have a non-string tag
+    return not isinstance(element.tag, str) or element.tag in SKIPPED_TAGS
+
+
+def _strings(root) -> Iterator[str]:
+    """
+    Text pieces of an element in document order, without recursion so deeply nested pages are fine.
+    """
+    if root.text:
+        yield root.text
+    stack = [(iter(root), None)]
+    while stack:
+        children, tail = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if tail:
+                yield tail
+            continue
+        if _is_skipped(child):
+            if child.tail:
+                yield child.tail
+            continue
+        if child.text:
+            yield child.text
+        stack.append((iter(child), child.tail))
+
+
+def get_text(element, separator: str = "") -> str:
+    """
+    Equivalent of BeautifulSoup's get_text(separator=separator, strip=True).
+    """
+    return separator.join(piece for piece in (s.strip() for s in _strings(element)) if piece)
+
+
+class ArticleParser:
+    """
+    Extracts the title and the body of an article from a single lxml parse of the page.
+
+    Follows the same rules as TitleParser and BodyParser, but text lengths are computed for every
+    node in one bottom-up pass, so only the winning block is ever serialized.
+    """
+
+    @staticmethod
+    def parse(html_content: str) -> Tuple[Optional[str], Optional[str]]:
+        if not html_content or not html_content.strip():
+            return None, None
+        try:
+            root = lxml.html.document_fromstring(html_content.encode("utf-8", "replace"), parser=html_parser)
+        except etree.ParserError:
+            return None, None
+        return ArticleParser.parse_title(root), ArticleParser.parse_body(root)
+
+    @staticmethod
+    def parse_title(root) -> Optional[str]:
+        title = None
+        title_element = root.find('.//title')
+        if title_element is not None:
+            title = get_text(title_element)
+        # Optionally, look for a primary headline element.
+        h1 = root.find('.//h1')
+        if h1 is not None:
+            h1_text = get_text(h1)
+            if not title or len(h1_text) > len(title):
+                title = h1_text
+        return title
+
+    @staticmethod
+    def parse_body(root) -> Optional[str]:
+        elements = list(root.iter())
+
+        # Bottom-up pass: (stripped characters, non-empty pieces) for every element,
+        # so len(get_text("\n", strip=True)) == characters + pieces - 1
+        stats: Dict[object, Tuple[int, int]] = {}
+        for element in reversed(elements):
+            if _is_skipped(element):
+                continue
+            characters, pieces = 0, 0
+            text = element.text.strip() if element.text else ""
+            if text:
+                characters, pieces = len(text), 1
+            for child in element:
+                if child in stats:
+                    child_characters, child_pieces = stats[child]
+                    characters += child_characters
+                    pieces += child_pieces
+                tail = child.tail.strip() if child.tail else ""
+                if tail:
+                    characters += len(tail)
+                    pieces += 1
+            stats[element] = (characters, pieces)
+
+        # Start with common article tags
+        for element in elements:
+            if element.tag in ARTICLE_TAGS and stats[element][1]:
+                return get_text(element, "\n")
+
+        # If no common article tag, look for div tags with common class names
+        first_div_by_class = {}
+        for element in elements:
+            if element.tag == 'div':
+                for class_name in (element.get('class') or '').split():
+                    first_div_by_class.setdefault(class_name, element)
+        for class_name in COMMON_CLASSES:
+            if class_name in first_div_by_class:
+                return get_text(first_div_by_class[class_name], "\n")
+
+        # Fallback to finding the largest content block by text length
+        largest_block = None
+        max_length = 0
+        for element in elements:
+            if element.tag in BLOCK_TAGS:
+                characters, pieces = stats[element]
+                length = characters + pieces - 1 if pieces else 0
+                if length > max_length:
+                    max_length = length
+                    largest_block = element
+
+        return get_text(largest_block, "\n") if largest_block is not None else None
@@ -0,0 +1,66 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from pydantic import BaseModel
+
+from src.utils.urls import canonicalize_url
+
+T = TypeVar("T")
+
+
+class DedupStats(BaseModel):
+    unique: int = 0
+    duplicates: int = 0
+    failed: int = 0
+
+
+class URLDeduplicator(Generic[T]):
+    """
+    Run-wide index of article URLs by canonicalize_url, shared by every task on the event loop.
+
+    The first occurrence of an article starts its extraction; every later occurrence, from another
+    bin, another window or the same chart, awaits the same result instead of downloading and
+    parsing the page again. Results of the last max_entries completed URLs are kept; failures are
+    shared with whoever was already waiting, then forgotten so a later occurrence can retry.
+
+    The index lives in the memory of one process. Workers of a distributed run each keep their
+    own, so a URL two workers come across is extracted by both; a shared html_cache_dir only
+    spares the second download once the first has finished.
+    """
+    __entries: "OrderedDict[str, asyncio.Future]"
+    __max_entries: int
+    stats: DedupStats
+
+    def __init__(self, max_entries: int = 10000):
+        self.__entries = OrderedDict()
+        self.__max_entries = max_entries
+        self.stats = DedupStats()
+
+    async def run(self, url: str, extract: Callable[[], Awaitable[T]]) -> T:
+        key = canonicalize_url(url)
+        entry = self.__entries.get(key)
+        if entry is not None:
+            self.stats.duplicates += 1
+            self.__entries.move_to_end(key)
+        else:
+            self.stats.unique += 1
+            entry = self.__entries[key] = asyncio.ensure_future(extract())
+            entry.add_done_callback(lambda future: self.__completed(key, future))
+            self.__evict()
+        # Cancelling one waiter must not cancel the extraction the others are waiting for
+        return await asyncio.shield(entry)
+
+    def __completed(self, key: str, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            self.stats.failed += 1
+            if self.__entries.get(key) is future:
+                del self.__entries[key]
+
+    def __evict(self):
+        # Only completed entries are evicted, the in-flight ones are still being waited on
+        while len(self.__entries) > self.__max_entries:
+            key, oldest = next(iter(self.__entries.items()))
+            if not oldest.done():
+                break
+            del self.__entries[key]
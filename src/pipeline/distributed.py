@@ -0,0 +1,68 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Set
+
+from loguru import logger
+
+from src.pipeline.ledger import TaskLedger
+
+
+def worker_name() -> str:
+    # Unique even when a pid is reused, every worker has a spool directory of its own
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class TaskSource:
+    """
+    Feeds one worker with tasks claimed from a ledger shared by every worker, on this host or
+    others, and renews their leases every heartbeat_interval while the worker is alive.
+
+    The worker keeps up to concurrency claimed tasks running and polls for more every
+    poll_interval. It stops once no task is left unfinished anywhere, so tasks other workers
+    fail or abandon are still picked up while they run.
+    """
+    __ledger: TaskLedger
+    __max_attempts: int
+    __poll_interval: float
+    __heartbeat_interval: float
+
+    def __init__(self, ledger: TaskLedger, max_attempts: int, poll_interval: float = 5, heartbeat_interval: float = 15):
+        self.__ledger = ledger
+        self.__max_attempts = max_attempts
+        self.__poll_interval = poll_interval
+        self.__heartbeat_interval = heartbeat_interval
+
+    async def __heartbeat(self):
+        while True:
+            await asyncio.sleep(self.__heartbeat_interval)
+            try:
+                await asyncio.to_thread(self.__ledger.heartbeat)
+            except Exception as e:
+                logger.warning(f"Heartbeat of worker {self.__ledger.worker_id} failed: {e}")
+
+    async def run(self, run_task: Callable[[dict], Awaitable[None]], concurrency: int):
+        running: Set[asyncio.Task] = set()
+        heartbeat = asyncio.create_task(self.__heartbeat())
+        claimed_total = 0
+        try:
+            while True:
+                free = concurrency - len(running)
+                claimed = await asyncio.to_thread(self.__ledger.claim, free, self.__max_attempts) if free > 0 else []
+                for task in claimed:
+                    job = asyncio.create_task(run_task(task))
+                    running.add(job)
+                    job.add_done_callback(running.discard)
+                claimed_total += len(claimed)
+                if running:
+                    await asyncio.wait(running, timeout=self.__poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                elif await asyncio.to_thread(self.__ledger.outstanding, self.__max_attempts) == 0:
+                    break
+                else:
+                    # Everything left is running on other workers, some of it may come back
+                    await asyncio.sleep(self.__poll_interval)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+        logger.info(f"Worker {self.__ledger.worker_id} ran {claimed_total} claimed tasks, none are left")
@@ -0,0 +1,280 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+from enum import Enum
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+DATETIME_FORMAT = "%Y%m%d%H%M%S"
+
+
+class TaskState(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMMITTING = "committing"  # output is being appended, output_offset marks where it started
+    DONE = "done"
+    FAILED = "failed"
+    SPLIT = "split"            # replaced by smaller windows, see src/pipeline/windows.py
+
+
+def task_id_for(country: str, start_datetime: datetime, end_datetime: datetime) -> str:
+    return f"{country}|{start_datetime.strftime(DATETIME_FORMAT)}|{end_datetime.strftime(DATETIME_FORMAT)}"
+
+
+class TaskLedger:
+    """
+    Persistent record of every (country, window) task: its state, attempts and where its
+    output landed, so a run can be interrupted and resumed without redoing or duplicating work.
+
+    With a worker_id the ledger is also a work queue shared by several processes or hosts
+    (see src/pipeline/distributed.py): tasks are claimed with a lease that the worker renews
+    with heartbeats, and tasks whose lease ran out are recovered and claimed by another worker.
+    """
+    worker_id: Optional[str]
+    __lease_seconds: float
+    __connection: sqlite3.Connection
+    __lock: Lock
+
+    def __init__(self, path: str, worker_id: Optional[str] = None, lease_seconds: float = 60):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.worker_id = worker_id
+        self.__lease_seconds = lease_seconds
+        self.__lock = Lock()
+        # Other workers hold the write lock for a moment at a time, wait for it instead of failing
+        self.__connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                country TEXT NOT NULL,
+                start_datetime TEXT NOT NULL,
+                end_datetime TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output_file TEXT,
+                output_offset INTEGER,
+                output_end INTEGER,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in self.__connection.execute("PRAGMA table_info(tasks)")}
+        # Ledgers written before work queues existed
+        if "worker_id" not in columns:
+            self.__connection.execute("ALTER TABLE tasks ADD COLUMN worker_id TEXT")
+            self.__connection.execute("ALTER TABLE tasks ADD COLUMN lease_expires REAL")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state)")
+        self.__connection.commit()
+
+    def __lease(self) -> Optional[float]:
+        return time.time() + self.__lease_seconds if self.worker_id is not None else None
+
+    def __execute(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        with self.__lock:
+            rows = self.__connection.execute(sql, parameters).fetchall()
+            self.__connection.commit()
+            return rows
+
+    def add_tasks(self, windows: List[Tuple[str, datetime, datetime]]):
+        """
+        Register (country, start, end) windows. Windows already in the ledger keep their state.
+        """
+        now = time.time()
+        rows = [
+            (task_id_for(country, start, end), country, start.strftime(DATETIME_FORMAT), end.strftime(DATETIME_FORMAT), TaskState.PENDING.value, now)
+            for country, start, end in windows
+        ]
+        with self.__lock:
+            self.__connection.executemany(
+                "INSERT OR IGNORE INTO tasks (task_id, country, start_datetime, end_datetime, state, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.__connection.commit()
+
+    def windows(self, country: str) -> List[Tuple[datetime, datetime]]:
+        """
+        (start, end) of every task of the country that has not been split, whatever its state.
+        """
+        rows = self.__execute(
+            "SELECT start_datetime, end_datetime FROM tasks WHERE country = ? AND state != ?",
+            (country, TaskState.SPLIT.value)
+        )
+        return [(datetime.strptime(start, DATETIME_FORMAT), datetime.strptime(end, DATETIME_FORMAT)) for start, end in rows]
+
+    def runnable_tasks(self, max_attempts: int) -> List[dict]:
+        """
+        Pending tasks plus failed ones that still have attempts left, oldest window first.
+        """
+        rows = self.__execute(
+            "SELECT task_id, country, start_datetime, end_datetime, attempts FROM tasks "
+            "WHERE state = ? OR (state = ? AND attempts < ?) ORDER BY start_datetime, country",
+            (TaskState.PENDING.value, TaskState.FAILED.value, max_attempts)
+        )
+        return [
+            {
+                "task_id": task_id,
+                "country": country,
+                "start_date": datetime.strptime(start, DATETIME_FORMAT),
+                "end_date": datetime.strptime(end, DATETIME_FORMAT),
+                "attempts": attempts,
+            }
+            for task_id, country, start, end, attempts in rows
+        ]
+
+    def claim(self, limit: int, max_attempts: int) -> List[dict]:
+        """
+        Lease up to limit runnable tasks nobody else holds a lease on to this worker, oldest window first.
+        """
+        now = time.time()
+        lease = self.__lease()
+        self.__execute(
+            "UPDATE tasks SET worker_id = ?, lease_expires = ? WHERE task_id IN ("
+            "SELECT task_id FROM tasks WHERE (state = ? OR (state = ? AND attempts < ?)) "
+            "AND (lease_expires IS NULL OR lease_expires < ?) ORDER BY start_datetime, country LIMIT ?)",
+            (self.worker_id, lease, TaskState.PENDING.value, TaskState.FAILED.value, max_attempts, now, limit)
+        )
+        rows = self.__execute(
+            "SELECT task_id, country, start_datetime, end_datetime, attempts FROM tasks "
+            "WHERE worker_id = ? AND lease_expires = ? ORDER BY start_datetime, country",
+            (self.worker_id, lease)
+        )
+        return [
+            {
+                "task_id": task_id,
+                "country": country,
+                "start_date": datetime.strptime(start, DATETIME_FORMAT),
+                "end_date": datetime.strptime(end, DATETIME_FORMAT),
+                "attempts": attempts,
+            }
+            for task_id, country, start, end, attempts in rows
+        ]
+
+    def heartbeat(self):
+        """
+        Renew the lease of every unfinished task of this worker.
+        """
+        self.__execute(
+            "UPDATE tasks SET lease_expires = ? WHERE worker_id = ? AND state IN (?, ?, ?, ?)",
+            (self.__lease(), self.worker_id, TaskState.PENDING.value, TaskState.FAILED.value,
+             TaskState.RUNNING.value, TaskState.COMMITTING.value)
+        )
+
+    def holds(self, task_id: str) -> bool:
+        """
+        Whether the task is still this worker's, i.e. was not recovered and handed to another one.
+        """
+        if self.worker_id is None:
+            return True
+        return bool(self.__execute("SELECT 1 FROM tasks WHERE task_id = ? AND worker_id = ?", (task_id, self.worker_id)))
+
+    def expired_tasks(self) -> List[Tuple[str, str, Optional[str], Optional[int], str]]:
+        """
+        (task_id, state, output_file, output_offset, worker_id) of running or committing tasks whose
+        worker stopped renewing their lease.
+        """
+        return self.__execute(
+            "SELECT task_id, state, output_file, output_offset, worker_id FROM tasks "
+            "WHERE state IN (?, ?) AND lease_expires < ?",
+            (TaskState.RUNNING.value, TaskState.COMMITTING.value, time.time())
+        )
+
+    def committing_tasks(self) -> List[Tuple[str, str, int]]:
+        """
+        (task_id, output_file, output_offset) of tasks in the middle of appending their output.
+        """
+        return self.__execute(
+            "SELECT task_id, output_file, output_offset FROM tasks WHERE state = ? AND output_file IS NOT NULL",
+            (TaskState.COMMITTING.value,)
+        )
+
+    def outstanding(self, max_attempts: int) -> int:
+        """
+        Tasks that are not finished yet: runnable, running or committing.
+        """
+        return self.__execute(
+            "SELECT COUNT(*) FROM tasks WHERE state IN (?, ?, ?) OR (state = ? AND attempts < ?)",
+            (TaskState.PENDING.value, TaskState.RUNNING.value, TaskState.COMMITTING.value, TaskState.FAILED.value, max_attempts)
+        )[0][0]
+
+    def interrupted_tasks(self) -> List[Tuple[str, str, Optional[str], Optional[int]]]:
+        """
+        (task_id, state, output_file, output_offset) of tasks a previous run left running or committing.
+        Tasks leased to a worker that is still renewing its lease are not interrupted.
+        """
+        return self.__execute(
+            "SELECT task_id, state, output_file, output_offset FROM tasks WHERE state IN (?, ?) "
+            "AND (lease_expires IS NULL OR lease_expires < ?)",
+            (TaskState.RUNNING.value, TaskState.COMMITTING.value, time.time())
+        )
+
+    def mark_running(self, task_id: str):
+        self.__execute(
+            "UPDATE tasks SET state = ?, attempts = attempts + 1, error = NULL, updated_at = ? WHERE task_id = ?",
+            (TaskState.RUNNING.value, time.time(), task_id)
+        )
+
+    def mark_committing(self, task_id: str, output_file: str, output_offset: int):
+        self.__execute(
+            "UPDATE tasks SET state = ?, output_file = ?, output_offset = ?, updated_at = ? WHERE task_id = ?",
+            (TaskState.COMMITTING.value, output_file, output_offset, time.time(), task_id)
+        )
+
+    def mark_done(self, task_id: str, output_end: Optional[int] = None):
+        self.__execute(
+            "UPDATE tasks SET state = ?, output_end = ?, worker_id = NULL, lease_expires = NULL, updated_at = ? WHERE task_id = ?",
+            (TaskState.DONE.value, output_end, time.time(), task_id)
+        )
+
+    def split(self, task_id: str, country: str, windows: List[Tuple[datetime, datetime]]) -> List[dict]:
+        """
+        Replace a task by pending tasks for the given windows, in one transaction so an interrupted
+        run finds either the task or its replacements. Returns the tasks this call inserted: windows
+        the ledger already has, done by an earlier run or leased to another worker, are left to it.
+        """
+        now = time.time()
+        tasks = [
+            {"task_id": task_id_for(country, start, end), "country": country, "start_date": start, "end_date": end, "attempts": 0}
+            for start, end in windows
+        ]
+        # A worker keeps the new tasks, it runs them right away
+        lease = self.__lease()
+        inserted = []
+        with self.__lock:
+            for task in tasks:
+                cursor = self.__connection.execute(
+                    "INSERT OR IGNORE INTO tasks (task_id, country, start_datetime, end_datetime, state, updated_at, worker_id, lease_expires) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (task["task_id"], country, task["start_date"].strftime(DATETIME_FORMAT), task["end_date"].strftime(DATETIME_FORMAT),
+                     TaskState.PENDING.value, now, self.worker_id, lease)
+                )
+                if cursor.rowcount:
+                    inserted.append(task)
+            self.__connection.execute(
+                "UPDATE tasks SET state = ?, worker_id = NULL, lease_expires = NULL, updated_at = ? WHERE task_id = ?",
+                (TaskState.SPLIT.value, now, task_id)
+            )
+            self.__connection.commit()
+        return inserted
+
+    def mark_failed(self, task_id: str, error: str):
+        self.__execute(
+            "UPDATE tasks SET state = ?, error = ?, worker_id = NULL, lease_expires = NULL, updated_at = ? WHERE task_id = ?",
+            (TaskState.FAILED.value, error[:1000], time.time(), task_id)
+        )
+
+    def reset(self, task_id: str):
+        self.__execute(
+            "UPDATE tasks SET state = ?, worker_id = NULL, lease_expires = NULL, updated_at = ? WHERE task_id = ?",
+            (TaskState.PENDING.value, time.time(), task_id)
+        )
+
+    def summary(self) -> Dict[str, int]:
+        return dict(self.__execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"))
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
@@ -0,0 +1,77 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from loguru import logger
+
+from src.pipeline.dedup import URLDeduplicator
+from src.pipeline.near_duplicates import StoryIndex
+from src.utils.async_requests import FETCH, AsyncFetcher
+from src.utils.html_cache import HTMLCache
+from src.utils.metrics import REGISTRY, SamplingProfiler, start_metrics_server, track, write_snapshots
+
+# Stages of the pipeline: GDELT API call, HTML download, title/body parse, sink write.
+# FETCH is timed by AsyncFetcher itself, without the wait for a host slot.
+API = "api"
+PARSE = "parse"
+WRITE = "write"
+COMMIT = "commit"
+
+ARTICLES = REGISTRY.counter("pipeline_articles_total", "Articles by outcome (written, failed)", ["status"])
+RECORDS_WRITTEN = REGISTRY.counter("pipeline_records_written_total", "Output records handed to the sink")
+TASKS = REGISTRY.counter("pipeline_tasks_total", "Finished tasks by state (done, failed)", ["state"])
+
+
+def register_run_metrics(fetcher: AsyncFetcher, cache: Optional[HTMLCache], dedup: URLDeduplicator,
+                         write_queue: asyncio.Queue, stories: Optional[StoryIndex] = None):
+    """
+    Export the counters the run's objects already keep, read whenever metrics are exported.
+    """
+    REGISTRY.register_callback("pipeline_write_queue_depth", "Records waiting for the writer",
+                               lambda: {(): write_queue.qsize()})
+    REGISTRY.register_callback("fetch_requests_total", "HTTP responses received, API and articles",
+                               lambda: {(): fetcher.stats.requests}, kind="counter")
+    REGISTRY.register_callback("fetch_bytes_downloaded_total", "Response body bytes received, API and articles",
+                               lambda: {(): fetcher.stats.bytes_downloaded}, kind="counter")
+    REGISTRY.register_callback("fetch_host_failures_total", "Connection errors, timeouts and 5xx responses",
+                               lambda: {(): fetcher.scheduler.stats.failures}, kind="counter")
+    REGISTRY.register_callback("dedup_articles_total", "Article occurrences by whether they were extracted or shared",
+                               lambda: {("unique",): dedup.stats.unique, ("duplicate",): dedup.stats.duplicates},
+                               ["kind"], kind="counter")
+    if stories is not None:
+        REGISTRY.register_callback("near_duplicate_articles_total", "Indexed article bodies by whether they started a story or copied one",
+                                   lambda: {("story",): stories.stats.stories, ("copy",): stories.stats.copies,
+                                            ("unindexed",): stories.stats.unindexed, ("skipped",): stories.stats.skipped},
+                                   ["kind"], kind="counter")
+    if cache is not None:
+        REGISTRY.register_callback("html_cache_events_total", "HTML cache lookups by outcome",
+                                   lambda: {("hit",): cache.stats.hits, ("revalidated",): cache.stats.revalidated,
+                                            ("miss",): cache.stats.misses}, ["event"], kind="counter")
+
+
+@asynccontextmanager
+async def exporting(snapshot_path: Optional[str], snapshot_interval: float, port: Optional[int],
+                    profile_path: Optional[str], profile_interval: float) -> AsyncIterator[None]:
+    """
+    While the block runs: append JSON snapshots to snapshot_path, serve /metrics on port and
+    sample the event loop's stack into profile_path, for whichever of them is set.
+    """
+    snapshots = asyncio.create_task(write_snapshots(REGISTRY, snapshot_path, snapshot_interval)) if snapshot_path else None
+    server = await start_metrics_server(REGISTRY, port) if port else None
+    profiler = SamplingProfiler(profile_interval) if profile_path else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(profile_path)
+            hot_spots = ", ".join(f"{function} {share:.0%}" for function, share in profiler.top(5))
+            logger.info(f"Profile written to {profile_path}, hot spots: {hot_spots}")
+        if server is not None:
+            await server.cleanup()
+        if snapshots is not None:
+            # The snapshot task writes a last snapshot as it is cancelled
+            snapshots.cancel()
+            await asyncio.gather(snapshots, return_exceptions=True)
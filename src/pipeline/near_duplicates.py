@@ -0,0 +1,201 @@
+import hashlib
+import os
+import re
+import sqlite3
+import zlib
+from functools import lru_cache
+from threading import Lock
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from src.utils.urls import canonicalize_url
+
+# Word n-grams compared between bodies, and the fewest words a body needs to be compared at all:
+# paywall notices, cookie walls and other boilerplate-only bodies must not become one story
+SHINGLE_SIZE = 5
+MIN_WORDS = 50
+
+WORD = re.compile(r"\w+")
+_PRIME = np.uint64((1 << 61) - 1)
+_MASK = np.uint64(0xFFFFFFFF)
+# Rows of shingles hashed at once, bounds the (shingles, permutations) intermediate of long bodies
+_CHUNK = 4096
+
+
+@lru_cache(maxsize=8)
+def _permutations(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    # A fixed seed, signatures of every run and worker must be comparable
+    generator = np.random.default_rng(1)
+    return (generator.integers(1, 1 << 32, num_perm, dtype=np.uint64),
+            generator.integers(0, 1 << 32, num_perm, dtype=np.uint64))
+
+
+def minhash(text: Optional[str], num_perm: int = 128, shingle_size: int = SHINGLE_SIZE,
+            min_words: int = MIN_WORDS) -> Optional[bytes]:
+    """
+    MinHash signature of the word shingles of a text, num_perm 32-bit values. The share of equal
+    values of two signatures estimates the Jaccard similarity of the texts. None for texts of
+    fewer than min_words words.
+    """
+    words = WORD.findall(text.lower()) if text else []
+    if len(words) < min_words:
+        return None
+    shingles = {" ".join(words[index:index + shingle_size]) for index in range(len(words) - shingle_size + 1)}
+    hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), np.uint64, len(shingles))
+    a, b = _permutations(num_perm)
+    signature = np.full(num_perm, _MASK, np.uint64)
+    for start in range(0, len(hashes), _CHUNK):
+        # a and hash are below 2**32, so a * hash fits in uint64; reduced before b is added, the
+        # sum stays below 2**62 and the universal hash (a * hash + b) mod prime is exact
+        values = (np.outer(hashes[start:start + _CHUNK], a) % _PRIME + b) % _PRIME & _MASK
+        np.minimum(signature, values.min(axis=0), out=signature)
+    return signature.astype(np.uint32).tobytes()
+
+
+def similarity(signature: bytes, other: bytes) -> float:
+    return float(np.mean(np.frombuffer(signature, np.uint32) == np.frombuffer(other, np.uint32)))
+
+
+class Story(NamedTuple):
+    url: str    # URL of the first copy indexed, which identifies the story
+    copy: bool  # whether the article is a later copy of it
+
+
+class NearDuplicateStats(BaseModel):
+    stories: int = 0
+    copies: int = 0
+    unindexed: int = 0  # bodies too short to compare
+    skipped: int = 0    # known copies that were not fetched again
+
+
+class StoryIndex:
+    """
+    Persistent LSH index of the MinHash signatures of article bodies, grouping the copies of a
+    wire-service story published under different URLs.
+
+    Only the first copy of a story is indexed: its signature is split into bands of rows values
+    and every band is hashed into a bucket. A later body sharing a bucket with a story is compared
+    with it and joins it when their estimated similarity reaches threshold, otherwise it starts a
+    story of its own. Articles are keyed by canonicalize_url, so an article seen again, by this run,
+    a later one or another worker sharing the index, keeps its story.
+    """
+    __connection: sqlite3.Connection
+    __lock: Lock
+    __bands: int
+    __rows: int
+    __threshold: float
+    stats: NearDuplicateStats
+
+    def __init__(self, path: str, bands: int = 32, rows: int = 4, threshold: float = 0.6):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__bands = bands
+        self.__rows = rows
+        self.__threshold = threshold
+        self.__lock = Lock()
+        self.stats = NearDuplicateStats()
+        # Shared by every worker of a distributed run
+        self.__connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS articles (
+                key TEXT PRIMARY KEY,
+                story TEXT NOT NULL,
+                copy INTEGER NOT NULL,
+                signature BLOB
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                hash INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (band, hash, key)
+            ) WITHOUT ROWID;
+            """
+        )
+        self.__connection.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('bands', ?), ('rows', ?)", (bands, rows))
+        self.__connection.commit()
+        meta = dict(self.__connection.execute("SELECT name, value FROM meta").fetchall())
+        if (meta["bands"], meta["rows"]) != (bands, rows):
+            raise ValueError(f"{path} indexes signatures of {meta['bands']} bands of {meta['rows']} rows, "
+                             f"not of {bands} bands of {rows} rows")
+
+    @property
+    def num_perm(self) -> int:
+        return self.__bands * self.__rows
+
+    def lookup(self, url: str) -> Optional[Story]:
+        """
+        Story of an article already indexed.
+        """
+        with self.__lock:
+            row = self.__connection.execute("SELECT story, copy FROM articles WHERE key = ?", (canonicalize_url(url),)).fetchone()
+        return Story(row[0], bool(row[1])) if row is not None else None
+
+    def add(self, url: str, signature: Optional[bytes]) -> Story:
+        """
+        Story of an article given the minhash of its body, which becomes a new one unless a story
+        of the index is similar enough. Articles without a signature are their own story and are
+        not indexed.
+        """
+        if signature is None:
+            self.stats.unindexed += 1
+            return Story(url, False)
+        if len(signature) != 4 * self.num_perm:
+            raise ValueError(f"Expected a signature of {self.num_perm} values, got {len(signature) // 4}")
+        key = canonicalize_url(url)
+        buckets = self.__buckets(signature)
+        with self.__lock:
+            # Claims the write lock up front, two workers must not both start the same story
+            self.__connection.execute("BEGIN IMMEDIATE")
+            try:
+                story = self.__add(key, url, signature, buckets)
+            except BaseException:
+                self.__connection.rollback()
+                raise
+            self.__connection.commit()
+        if story.copy:
+            self.stats.copies += 1
+        else:
+            self.stats.stories += 1
+        return story
+
+    def __add(self, key: str, url: str, signature: bytes, buckets: List[Tuple[int, int]]) -> Story:
+        row = self.__connection.execute("SELECT story, copy FROM articles WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            return Story(row[0], bool(row[1]))
+        candidates = self.__connection.execute(
+            "SELECT DISTINCT articles.story, articles.signature FROM buckets JOIN articles ON articles.key = buckets.key "
+            f"WHERE (buckets.band, buckets.hash) IN (VALUES {', '.join(['(?, ?)'] * len(buckets))})",
+            [value for bucket in buckets for value in bucket]
+        ).fetchall()
+        best, best_similarity = None, self.__threshold
+        for story, other in candidates:
+            if (value := similarity(signature, other)) >= best_similarity:
+                best, best_similarity = story, value
+        if best is not None:
+            # Copies are never compared against, they only need their story
+            self.__connection.execute("INSERT INTO articles (key, story, copy, signature) VALUES (?, ?, 1, NULL)", (key, best))
+            return Story(best, True)
+        self.__connection.execute("INSERT INTO articles (key, story, copy, signature) VALUES (?, ?, 0, ?)", (key, url, signature))
+        self.__connection.executemany("INSERT OR IGNORE INTO buckets (band, hash, key) VALUES (?, ?, ?)",
+                                      [(band, value, key) for band, value in buckets])
+        return Story(url, False)
+
+    def __buckets(self, signature: bytes) -> List[Tuple[int, int]]:
+        width = 4 * self.__rows
+        return [
+            (band, int.from_bytes(hashlib.blake2b(signature[band * width:(band + 1) * width], digest_size=8).digest(),
+                                  "little", signed=True))
+            for band in range(self.__bands)
+        ]
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
@@ -0,0 +1,132 @@
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.gdelt.article import ToneChartSummary
+from src.pipeline.sinks import OutputSink, Record, spool_dir_for
+
+# One row per article. country, year and month are not stored in the files,
+# they come from the hive partition directories (country=US/year=2018/month=1).
+ARTICLE_SCHEMA = pa.schema([
+    ("start_datetime", pa.timestamp("s")),
+    ("end_datetime", pa.timestamp("s")),
+    ("bin", pa.int32()),
+    ("count", pa.int32()),
+    ("url", pa.string()),
+    ("title", pa.string()),
+    ("html_title", pa.string()),
+    ("html_body", pa.string()),
+    ("story", pa.string()),
+])
+
+
+def partition_dir(base_dir: str, source_country: str, year: int, month: int) -> str:
+    country = source_country.replace("sourcecountry:", "")
+    return os.path.join(base_dir, f"country={country}", f"year={year}", f"month={month}")
+
+
+class _TaskOutput:
+    """
+    Rows of one task waiting for the next row group, and the writer of its temporary file.
+    """
+    __slots__ = ("rows", "bin_counts", "writer", "partition")
+
+    def __init__(self):
+        self.rows: Dict[str, list] = {name: [] for name in ARTICLE_SCHEMA.names}
+        self.bin_counts: Dict[int, int] = {}
+        self.writer: Optional[pq.ParquetWriter] = None
+        self.partition: Optional[str] = None
+
+
+class ParquetSink(OutputSink):
+    """
+    Writes flattened article rows to zstd-compressed Parquet, partitioned by country/year/month.
+
+    Each task becomes one part-<task>.parquet file. Rows are buffered into row groups of
+    row_group_size while the task runs, written to a temporary file under <base_dir>/.spool, and
+    renamed into its partition on commit, so re-running a task atomically replaces its file.
+    """
+    __base_dir: str
+    __spool_dir: str
+    __row_group_size: int
+    __tasks: Dict[str, _TaskOutput]
+
+    def __init__(self, base_dir: str = "output_parquet", row_group_size: int = 10000, spool_name: Optional[str] = None):
+        self.__base_dir = base_dir
+        self.__spool_dir = spool_dir_for(base_dir, spool_name)
+        self.__row_group_size = row_group_size
+        self.__tasks = {}
+        os.makedirs(self.__spool_dir, exist_ok=True)
+
+    @staticmethod
+    def __file_name(task_id: str) -> str:
+        return "part-" + re.sub(r"[^A-Za-z0-9_-]", "_", task_id) + ".parquet"
+
+    def __spool_path(self, task_id: str) -> str:
+        return os.path.join(self.__spool_dir, self.__file_name(task_id))
+
+    def write(self, task_id: str, records: List[Record]):
+        output = self.__tasks.setdefault(task_id, _TaskOutput())
+        for record in records:
+            if output.partition is None:
+                output.partition = partition_dir(self.__base_dir, record.source_country, record.start_datetime.year, record.start_datetime.month)
+            if isinstance(record, ToneChartSummary):
+                # Written ahead of the articles, so every article row can carry its bin's count
+                output.bin_counts.update((bin.bin, bin.count) for bin in record.bins)
+                continue
+            # timestamp("s") columns take the epoch seconds as they are
+            output.rows["start_datetime"].append(record.start_timestamp)
+            output.rows["end_datetime"].append(record.end_timestamp)
+            output.rows["bin"].append(record.gdelt_tone)
+            output.rows["count"].append(output.bin_counts.get(record.gdelt_tone))
+            output.rows["url"].append(record.url)
+            output.rows["title"].append(record.title)
+            output.rows["html_title"].append(record.html_title)
+            output.rows["html_body"].append(record.html_body)
+            output.rows["story"].append(record.story)
+            if len(output.rows["url"]) >= self.__row_group_size:
+                self.__flush(task_id, output)
+
+    def __flush(self, task_id: str, output: _TaskOutput):
+        if not output.rows["url"]:
+            return
+        table = pa.Table.from_pydict(output.rows, schema=ARTICLE_SCHEMA)
+        if output.writer is None:
+            output.writer = pq.ParquetWriter(self.__spool_path(task_id), ARTICLE_SCHEMA, compression="zstd")
+        output.writer.write_table(table, row_group_size=self.__row_group_size)
+        output.rows = {name: [] for name in ARTICLE_SCHEMA.names}
+
+    def commit(self, task_id: str, before_append: Callable[[str, int], None]) -> Optional[Tuple[str, int]]:
+        output = self.__tasks.pop(task_id, None)
+        if output is None:
+            return None
+        self.__flush(task_id, output)
+        if output.writer is None:
+            return None
+        output.writer.close()
+
+        filename = os.path.join(output.partition, self.__file_name(task_id))
+        os.makedirs(output.partition, exist_ok=True)
+        before_append(filename, 0)
+        os.replace(self.__spool_path(task_id), filename)
+        return filename, os.path.getsize(filename)
+
+    def discard(self, task_id: str):
+        output = self.__tasks.pop(task_id, None)
+        if output is not None and output.writer is not None:
+            output.writer.close()
+        spool_path = self.__spool_path(task_id)
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+    def rollback(self, filename: str, offset: int):
+        # The task is re-run and rewrites the whole file
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    def close(self):
+        for task_id in list(self.__tasks):
+            self.discard(task_id)
@@ -0,0 +1,100 @@
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from src.gdelt.article import ArticleRecord
+
+EPOCH = datetime(1970, 1, 1)
+DATETIME_FORMAT = "%Y%m%d%H%M%S"
+
+
+def to_timestamp(value: datetime) -> int:
+    """
+    Seconds since the epoch of a naive UTC datetime, as used by GDELT.
+    """
+    return int((value - EPOCH).total_seconds())
+
+
+def from_timestamp(value: int) -> datetime:
+    return EPOCH + timedelta(seconds=value)
+
+
+@lru_cache(maxsize=1024)
+def format_timestamp(value: int) -> str:
+    # Every article of a window shares its timestamps, so this is almost always a hit
+    return from_timestamp(value).strftime(DATETIME_FORMAT)
+
+
+@lru_cache(maxsize=1024)
+def parse_timestamp(value: str) -> int:
+    return to_timestamp(datetime.strptime(value, DATETIME_FORMAT))
+
+
+class CompactArticle:
+    """
+    In-memory form of an output article while it moves through the pipeline.
+
+    ArticleRecord is a pydantic model with a __dict__, validators and eleven fields; this keeps only
+    what is written out, in slots, with integer timestamps and an interned country string shared
+    by every article of a window. The pydantic model is only built at the boundaries (to_record).
+    """
+    __slots__ = ("url", "title", "gdelt_tone", "start_timestamp", "end_timestamp",
+                 "source_country", "html_title", "html_body", "story")
+
+    def __init__(self, url: str, title: str, gdelt_tone: int, start_timestamp: int, end_timestamp: int,
+                 source_country: str, html_title: Optional[str] = None, html_body: Optional[str] = None,
+                 story: Optional[str] = None):
+        self.url = url
+        self.title = title
+        self.gdelt_tone = gdelt_tone
+        self.start_timestamp = start_timestamp
+        self.end_timestamp = end_timestamp
+        self.source_country = sys.intern(source_country)
+        self.html_title = html_title
+        self.html_body = html_body
+        self.story = story
+
+    @property
+    def start_datetime(self) -> datetime:
+        return from_timestamp(self.start_timestamp)
+
+    @property
+    def end_datetime(self) -> datetime:
+        return from_timestamp(self.end_timestamp)
+
+    def __reduce__(self):
+        # A plain argument tuple pickles smaller than the default slot-state dict
+        return CompactArticle, (self.url, self.title, self.gdelt_tone, self.start_timestamp, self.end_timestamp,
+                                self.source_country, self.html_title, self.html_body, self.story)
+
+    def __repr__(self) -> str:
+        return f"CompactArticle(url={self.url!r}, gdelt_tone={self.gdelt_tone}, start_datetime={self.start_datetime})"
+
+    def to_dict(self) -> dict:
+        """
+        Same as ArticleRecord.model_dump(by_alias=True, exclude_none=True), without building the model.
+        """
+        data = {"url": self.url, "title": self.title}
+        if self.html_body is not None:
+            data["html_body"] = self.html_body
+        if self.html_title is not None:
+            data["html_title"] = self.html_title
+        data["tone"] = self.gdelt_tone
+        data["startdatetime"] = format_timestamp(self.start_timestamp)
+        data["enddatetime"] = format_timestamp(self.end_timestamp)
+        data["sourcecountry"] = self.source_country
+        data["record"] = "article"
+        if self.story is not None:
+            data["story"] = self.story
+        return data
+
+    def to_record(self) -> ArticleRecord:
+        return ArticleRecord(url=self.url, title=self.title, html_title=self.html_title, html_body=self.html_body,
+                             tone=self.gdelt_tone, startdatetime=self.start_datetime, enddatetime=self.end_datetime,
+                             sourcecountry=self.source_country, story=self.story)
+
+    @classmethod
+    def from_record(cls, record: ArticleRecord) -> "CompactArticle":
+        return cls(record.url, record.title, record.gdelt_tone, to_timestamp(record.start_datetime),
+                   to_timestamp(record.end_datetime), record.source_country, record.html_title, record.html_body, record.story)
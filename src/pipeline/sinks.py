@@ -0,0 +1,307 @@
+import asyncio
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from loguru import logger
+
+from src.analysis.aggregate_store import AggregateStore, WindowAggregate
+from src.gdelt.article import ToneChartSummary
+from src.pipeline.ledger import TaskLedger, TaskState
+from src.pipeline.metrics import COMMIT, RECORDS_WRITTEN, TASKS, WRITE, track
+from src.pipeline.records import CompactArticle
+
+try:
+    import fcntl
+except ImportError:  # Windows, where several workers cannot share an output directory
+    fcntl = None
+
+Record = Union[CompactArticle, ToneChartSummary]
+
+
+class TaskEnd(NamedTuple):
+    """
+    Queued after the last record of a task: commit its output, or discard it if the task failed.
+    """
+    succeeded: bool
+    error: Optional[str] = None
+
+
+class OutputSink(ABC):
+    """
+    Destination of the pipeline's output records. Records are written per task and only become
+    visible once the task is committed.
+    """
+
+    @abstractmethod
+    def write(self, task_id: str, records: List[Record]):
+        ...
+
+    @abstractmethod
+    def commit(self, task_id: str, before_append: Callable[[str, int], None]) -> Optional[Tuple[str, int]]:
+        """
+        Publish a task's records. before_append(filename, offset) is called right before the
+        output file is touched. Returns (filename, end offset) or None if the task wrote nothing.
+        """
+
+    @abstractmethod
+    def discard(self, task_id: str):
+        ...
+
+    @abstractmethod
+    def rollback(self, filename: str, offset: int):
+        """
+        Undo a commit that was interrupted after before_append(filename, offset) was called.
+        """
+
+    def commit_lock(self) -> ContextManager:
+        """
+        Held by a worker across a commit when several processes share the sink's directory, for
+        sinks whose commits touch files other tasks also write to.
+        """
+        return nullcontext()
+
+    def close(self):
+        pass
+
+
+def spool_dir_for(base_dir: str, spool_name: Optional[str]) -> str:
+    # Every worker spools to its own directory, two workers may briefly run the same task
+    return os.path.join(base_dir, ".spool", spool_name) if spool_name else os.path.join(base_dir, ".spool")
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Exclusive lock across processes (and hosts, on file systems with working flock), released
+    by the operating system if the holder dies.
+    """
+    with open(path, "a") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class JSONLinesSink(OutputSink):
+    """
+    Writes output records as JSON lines to output2/<country>/<year>/<month>.json.
+
+    Records are spooled per task under <base_dir>/.spool and only appended to the monthly file
+    once the task completes, so a failed or interrupted task never leaves partial output behind.
+    Workers sharing the directory spool under .spool/<spool_name> and append under commit_lock.
+    """
+    __base_dir: str
+    __spool_dir: str
+
+    def __init__(self, base_dir: str = "output2", spool_name: Optional[str] = None):
+        self.__base_dir = base_dir
+        self.__spool_dir = spool_dir_for(base_dir, spool_name)
+        os.makedirs(self.__spool_dir, exist_ok=True)
+
+    def filename_for(self, record: Record) -> str:
+        return f"{self.__base_dir}/{record.source_country}/{record.start_datetime.year}/{record.start_datetime.month}.json"
+
+    def __spool_path(self, task_id: str) -> str:
+        return os.path.join(self.__spool_dir, re.sub(r"[^A-Za-z0-9_-]", "_", task_id) + ".jsonl")
+
+    def write(self, task_id: str, records: List[Record]):
+        # Every record of a task shares its start_datetime, so they all go to the same file;
+        # the spool's first line remembers which one
+        spool_path = self.__spool_path(task_id)
+        lines = [] if os.path.exists(spool_path) else [self.filename_for(records[0]) + "\n"]
+        for record in records:
+            data = record.to_dict() if isinstance(record, CompactArticle) else record.model_dump(by_alias=True, exclude_none=True)
+            lines.append(json.dumps(data) + "\n")
+        with open(spool_path, "a") as file:
+            file.writelines(lines)
+
+    def commit(self, task_id: str, before_append: Callable[[str, int], None]) -> Optional[Tuple[str, int]]:
+        spool_path = self.__spool_path(task_id)
+        if not os.path.exists(spool_path):
+            return None
+        with open(spool_path, "rb") as spool:
+            filename = spool.readline().decode("utf-8").rstrip("\n")
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(filename, "ab") as file:
+                offset = file.tell()
+                before_append(filename, offset)
+                for line in spool:
+                    file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+                end = file.tell()
+        os.remove(spool_path)
+        return filename, end
+
+    def discard(self, task_id: str):
+        spool_path = self.__spool_path(task_id)
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+    def rollback(self, filename: str, offset: int):
+        # Cut off whatever the interrupted commit appended after offset
+        if os.path.exists(filename) and os.path.getsize(filename) > offset:
+            with open(filename, "r+b") as file:
+                file.truncate(offset)
+
+    def commit_lock(self) -> ContextManager:
+        # Monthly files are shared by every window of the month, so appends and their rollbacks take turns
+        return file_lock(os.path.join(self.__base_dir, ".commit.lock"))
+
+
+def create_sink(kind: str, json_dir: str, parquet_dir: str, row_group_size: int = 10000,
+                spool_name: Optional[str] = None) -> OutputSink:
+    if kind == "json":
+        return JSONLinesSink(json_dir, spool_name)
+    if kind == "parquet":
+        # pyarrow is only imported when Parquet output is asked for
+        from src.pipeline.parquet_sink import ParquetSink
+        return ParquetSink(parquet_dir, row_group_size, spool_name)
+    raise ValueError(f"Unknown output sink: {kind}")
+
+
+def recover_interrupted_tasks(ledger: TaskLedger, sink: OutputSink):
+    """
+    Undo the partial work of tasks a previous run left running or committing and make them pending again.
+    """
+    for task_id, state, output_file, output_offset in ledger.interrupted_tasks():
+        # output_file is kept from earlier attempts, only a commit in progress left anything to undo
+        if state == TaskState.COMMITTING.value and output_file is not None and output_offset is not None:
+            sink.rollback(output_file, output_offset)
+        sink.discard(task_id)
+        ledger.reset(task_id)
+        logger.info(f"Recovered interrupted task {task_id} ({state})")
+
+
+def recover_crashed_commits(ledger: TaskLedger, sink: OutputSink):
+    """
+    Roll back commits a dead worker left half done. Must be called under sink.commit_lock(),
+    where no live worker can be committing, so every committing task is a crashed one.
+    """
+    for task_id, output_file, output_offset in ledger.committing_tasks():
+        sink.rollback(output_file, output_offset)
+        ledger.reset(task_id)
+        logger.warning(f"Rolled back the interrupted commit of {task_id}")
+
+
+def recover_expired_tasks(ledger: TaskLedger, sink: OutputSink, worker_sink: Callable[[str], OutputSink]) -> int:
+    """
+    Make the tasks of workers that stopped renewing their leases pending again, rolling back
+    their half-done commits and removing their spools (worker_sink(worker_id) is that worker's sink).
+    Returns the number of tasks recovered.
+    """
+    expired = ledger.expired_tasks()
+    if not expired:
+        return 0
+    with sink.commit_lock():
+        recover_crashed_commits(ledger, sink)
+        for task_id, state, output_file, output_offset, worker_id in ledger.expired_tasks():
+            worker_sink(worker_id).discard(task_id)
+            ledger.reset(task_id)
+            logger.warning(f"Recovered task {task_id} ({state}) from worker {worker_id}, its lease expired")
+    return len(expired)
+
+
+class RecordWriter:
+    """
+    Applies queued (task_id, record) items to the sink, commits tasks in the ledger once they
+    end and keeps the aggregate store up to date with every committed window.
+    """
+    __sink: OutputSink
+    __ledger: TaskLedger
+    __store: Optional[AggregateStore]
+    __aggregates: Dict[str, WindowAggregate]
+    __broken_tasks: Set[str]
+
+    def __init__(self, sink: OutputSink, ledger: TaskLedger, store: Optional[AggregateStore] = None):
+        self.__sink = sink
+        self.__ledger = ledger
+        self.__store = store
+        self.__aggregates = {}
+        self.__broken_tasks = set()
+
+    def write_batch(self, batch: List[Tuple[str, Union[Record, TaskEnd]]]):
+        # Consecutive records of one task are written together, in queue order.
+        # A task that lost records to a write error is failed instead of committed.
+        pending: List[Record] = []
+        pending_task: Optional[str] = None
+        for task_id, item in batch + [(None, None)]:
+            if pending and (task_id != pending_task or not isinstance(item, (CompactArticle, ToneChartSummary))):
+                try:
+                    with track(WRITE):
+                        self.__sink.write(pending_task, pending)
+                    RECORDS_WRITTEN.inc(len(pending))
+                except Exception as e:
+                    logger.error(f"Error writing {len(pending)} records of {pending_task}: {e}")
+                    self.__broken_tasks.add(pending_task)
+                pending = []
+            if isinstance(item, TaskEnd):
+                if task_id in self.__broken_tasks:
+                    self.__broken_tasks.discard(task_id)
+                    item = TaskEnd(False, "records lost to a write error")
+                try:
+                    self.finish_task(task_id, item)
+                except Exception as e:
+                    logger.error(f"Error committing {task_id}: {e}")
+                    self.__ledger.mark_failed(task_id, str(e))
+            elif item is not None:
+                pending.append(item)
+                pending_task = task_id
+                if self.__store is not None:
+                    self.__aggregates.setdefault(task_id, WindowAggregate()).add(item)
+
+    def finish_task(self, task_id: str, end: TaskEnd):
+        aggregate = self.__aggregates.pop(task_id, None)
+        if not end.succeeded:
+            self.__sink.discard(task_id)
+            if not self.__ledger.holds(task_id):
+                return
+            self.__ledger.mark_failed(task_id, end.error or "unknown error")
+            TASKS.labels(state="failed").inc()
+            return
+        # Standalone runs are the only writer, workers sharing the output take turns
+        with self.__sink.commit_lock() if self.__ledger.worker_id is not None else nullcontext():
+            if not self.__ledger.holds(task_id):
+                # The lease ran out and the task was handed to another worker, which writes it instead
+                logger.warning(f"Task {task_id} is no longer held by this worker, its output is discarded")
+                self.__sink.discard(task_id)
+                return
+            if self.__ledger.worker_id is not None:
+                recover_crashed_commits(self.__ledger, self.__sink)
+            with track(COMMIT):
+                committed = self.__sink.commit(task_id, lambda filename, offset: self.__ledger.mark_committing(task_id, filename, offset))
+            if self.__store is not None and aggregate is not None:
+                self.__store.update(aggregate)
+            self.__ledger.mark_done(task_id, committed[1] if committed else None)
+        TASKS.labels(state="done").inc()
+
+    def close(self):
+        self.__sink.close()
+
+
+async def write_records(queue: asyncio.Queue, writer: RecordWriter, batch_size: int = 500):
+    """
+    Drain (task_id, record) items from the queue into the writer until a None sentinel is received.
+    Records already waiting in the queue are written together; a TaskEnd item commits its task.
+    """
+    done = False
+    while not done:
+        item = await queue.get()
+        if item is None:
+            break
+        batch = [item]
+        while len(batch) < batch_size and not queue.empty():
+            item = queue.get_nowait()
+            if item is None:
+                done = True
+                break
+            batch.append(item)
+        await asyncio.to_thread(writer.write_batch, batch)
+    writer.close()
@@ -0,0 +1,225 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from src.gdelt.decoding import ToneChartBinRecord
+
+DATETIME_FORMAT = "%Y%m%d%H%M%S"
+
+Window = Tuple[datetime, datetime]
+
+
+class _Observation:
+    __slots__ = ("start", "end", "total_count", "returned")
+
+    def __init__(self, start: datetime, end: datetime, total_count: int, returned: int):
+        self.start = start
+        self.end = end
+        self.total_count = total_count
+        self.returned = returned
+
+
+class VolumeProfile:
+    """
+    Persistent record of how many articles GDELT matched (the sum of the tonechart bin counts) and
+    how many it listed in every window fetched per country, kept across runs to plan later ones.
+    """
+    __connection: sqlite3.Connection
+    __lock: Lock
+    __observations: Dict[str, List[_Observation]]
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__lock = Lock()
+        # Shared by every worker of a distributed run
+        self.__connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS volumes (
+                country TEXT NOT NULL,
+                start_datetime TEXT NOT NULL,
+                end_datetime TEXT NOT NULL,
+                total_count INTEGER NOT NULL,
+                returned INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (country, start_datetime, end_datetime)
+            )
+            """
+        )
+        self.__connection.commit()
+        self.__observations = {}
+
+    def observations(self, country: str) -> List[_Observation]:
+        observations = self.__observations.get(country)
+        if observations is None:
+            with self.__lock:
+                rows = self.__connection.execute(
+                    "SELECT start_datetime, end_datetime, total_count, returned FROM volumes WHERE country = ?", (country,)
+                ).fetchall()
+            observations = self.__observations[country] = [
+                _Observation(datetime.strptime(start, DATETIME_FORMAT), datetime.strptime(end, DATETIME_FORMAT), total_count, returned)
+                for start, end, total_count, returned in rows
+            ]
+        return observations
+
+    def record(self, country: str, start: datetime, end: datetime, total_count: int, returned: int):
+        observations = self.observations(country)
+        observations[:] = [observation for observation in observations if (observation.start, observation.end) != (start, end)]
+        observations.append(_Observation(start, end, total_count, returned))
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO volumes (country, start_datetime, end_datetime, total_count, returned, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (country, start.strftime(DATETIME_FORMAT), end.strftime(DATETIME_FORMAT), total_count, returned, time.time())
+            )
+            self.__connection.commit()
+
+    def estimate(self, country: str, start: datetime, end: datetime) -> Optional[float]:
+        """
+        Expected number of matching articles in [start, end): the volume per second of the observed
+        windows overlapping it, or of every observed window of the country when less than half of
+        the range has been observed. None for a country that has never been fetched.
+        """
+        observations = self.observations(country)
+        if not observations:
+            return None
+        seconds = (end - start).total_seconds()
+        weighted_rate, overlap_seconds, covered = 0.0, 0.0, []
+        for observation in observations:
+            overlap = (min(end, observation.end) - max(start, observation.start)).total_seconds()
+            if overlap <= 0:
+                continue
+            weighted_rate += observation.total_count / (observation.end - observation.start).total_seconds() * overlap
+            overlap_seconds += overlap
+            covered.append((max(start, observation.start), min(end, observation.end)))
+        if _union_seconds(covered) >= seconds / 2:
+            return weighted_rate / overlap_seconds * seconds
+        total_seconds = sum((observation.end - observation.start).total_seconds() for observation in observations)
+        return sum(observation.total_count for observation in observations) / total_seconds * seconds
+
+    def capacity(self, country: str, min_coverage: float) -> Optional[int]:
+        """
+        Most articles GDELT listed for a window of the country that it only partly listed, i.e. what a
+        single call can return at best. None until such a window has been seen.
+        """
+        saturated = [observation.returned for observation in self.observations(country)
+                     if observation.returned < observation.total_count * min_coverage]
+        return max(saturated) if saturated else None
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+
+def _union_seconds(intervals: List[Window]) -> float:
+    total, reach = 0.0, None
+    for start, end in sorted(intervals):
+        if reach is not None and start < reach:
+            start = reach
+        if end > start:
+            total += (end - start).total_seconds()
+            reach = end if reach is None else max(reach, end)
+    return total
+
+
+class WindowPlanner:
+    """
+    Chooses the (start, end) windows of the tonechart tasks so each GDELT call lists as many of
+    the window's articles as it can.
+
+    GDELT matches far more articles in a busy week than a tonechart lists, so a window it only
+    partly lists (fewer than min_coverage of the matched articles) is bisected, down to
+    min_window. Windows of a country are planned from initial_window; with a volume profile from
+    earlier runs, windows expected to be partly listed are bisected up front, and consecutive
+    windows expected to fit into one call together are merged, up to max_window.
+    """
+    __profile: VolumeProfile
+    __initial_window: timedelta
+    __min_window: timedelta
+    __max_window: timedelta
+    __min_coverage: float
+    __default_capacity: int
+
+    def __init__(self, profile: VolumeProfile, initial_window: timedelta = timedelta(weeks=1),
+                 min_window: timedelta = timedelta(days=1), max_window: timedelta = timedelta(weeks=4),
+                 min_coverage: float = 0.5, default_capacity: int = 250):
+        self.__profile = profile
+        self.__initial_window = initial_window
+        self.__min_window = min_window
+        self.__max_window = max_window
+        self.__min_coverage = min_coverage
+        self.__default_capacity = default_capacity
+
+    def __capacity(self, country: str) -> int:
+        capacity = self.__profile.capacity(country, self.__min_coverage)
+        return capacity if capacity is not None else self.__default_capacity
+
+    def __can_split(self, start: datetime, end: datetime) -> bool:
+        return end - start >= 2 * self.__min_window
+
+    def plan(self, country: str, start: datetime, end: datetime) -> List[Window]:
+        capacity = self.__capacity(country)
+        windows = []
+        current = start
+        while current < end:
+            window_end = min(current + self.__initial_window, end)
+            windows.extend(self.__split(country, current, window_end, capacity))
+            current = window_end
+        return self.__merge(country, windows, capacity)
+
+    def plan_gaps(self, country: str, start: datetime, end: datetime, existing: List[Window]) -> List[Window]:
+        """
+        Plan only the parts of [start, end) that no existing window (e.g. a task already in the
+        ledger) overlaps, so re-planning never fetches a period twice.
+        """
+        windows = []
+        current = start
+        for existing_start, existing_end in sorted(existing):
+            if existing_end <= current or existing_start >= end:
+                continue
+            if existing_start > current:
+                windows.extend(self.plan(country, current, existing_start))
+            current = max(current, existing_end)
+        if current < end:
+            windows.extend(self.plan(country, current, end))
+        return windows
+
+    def __split(self, country: str, start: datetime, end: datetime, capacity: int) -> List[Window]:
+        estimate = self.__profile.estimate(country, start, end)
+        if estimate is None or capacity >= estimate * self.__min_coverage or not self.__can_split(start, end):
+            return [(start, end)]
+        middle = start + timedelta(seconds=(end - start).total_seconds() // 2)
+        return self.__split(country, start, middle, capacity) + self.__split(country, middle, end, capacity)
+
+    def __merge(self, country: str, windows: List[Window], capacity: int) -> List[Window]:
+        merged: List[Window] = []
+        for start, end in windows:
+            if merged:
+                previous_start, previous_end = merged[-1]
+                estimate = self.__profile.estimate(country, previous_start, end)
+                if (previous_end == start and end - previous_start <= self.__max_window
+                        and estimate is not None and estimate <= capacity):
+                    merged[-1] = (previous_start, end)
+                    continue
+            merged.append((start, end))
+        return merged
+
+    def observe(self, country: str, start: datetime, end: datetime, tonechart: List[ToneChartBinRecord]) -> List[Window]:
+        """
+        Record a fetched window's volume. Returns the windows to fetch instead when GDELT listed
+        too few of its articles and it can still be bisected, otherwise an empty list.
+        """
+        total_count = sum(bin.count for bin in tonechart)
+        returned = sum(len(bin.top_articles) for bin in tonechart)
+        self.__profile.record(country, start, end, total_count, returned)
+        if returned >= total_count * self.__min_coverage or not self.__can_split(start, end):
+            return []
+        # The profile now knows this window, so the halves are bisected further if they would still saturate
+        middle = start + timedelta(seconds=(end - start).total_seconds() // 2)
+        capacity = self.__capacity(country)
+        return self.__split(country, start, middle, capacity) + self.__split(country, middle, end, capacity)
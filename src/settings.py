@@ -1,6 +1,7 @@
+import json
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -27,6 +28,80 @@ class Settings(BaseSettings):
     num_threads_api: int = 30
     num_threads_scrape: int = 90
 
+    # Async fetch engine limits.
+    max_concurrent_requests: int = 500   # requests in flight across the whole run
+    max_requests_per_host: int = 8       # requests in flight against a single host
+    host_slow_latency: float = 2.0       # hosts averaging slower responses get fewer slots and lower priority
+    host_failure_threshold: int = 3      # consecutive failures before a host is paused
+    host_failure_cooldown: float = 30.0  # first pause of a failing host, doubled on every repeat
+    max_concurrent_tasks: int = 20       # (country, window) tasks processed at once
+    num_parse_workers: int = 4           # shared process pool for HTML parsing
+    request_timeout: int = 5             # seconds, per article download
+    api_timeout: int = 30                # seconds, per GDELT API call
+
+    # GDELT API pacing: adaptive token bucket, retries and circuit breaker.
+    gdelt_requests_per_second: float = 0.2      # starting rate, GDELT asks for one request every 5 seconds
+    gdelt_min_requests_per_second: float = 0.05
+    gdelt_max_requests_per_second: float = 1.0
+    gdelt_max_retries: int = 5
+    gdelt_backoff_base: float = 2.0             # seconds, doubled on every retry
+    gdelt_backoff_max: float = 120.0            # seconds
+    gdelt_breaker_threshold: int = 5            # consecutive failures before all callers pause
+    gdelt_breaker_cooldown: float = 60.0        # seconds
+
+    # On-disk HTML cache shared by every run.
+    html_cache_enabled: bool = True
+    html_cache_dir: str = ".cache/html"
+    html_cache_max_bytes: int = 5 * 1024 ** 3   # LRU eviction above this size
+    html_cache_max_age: int = 7 * 24 * 3600     # seconds before a page is revalidated
+
+    # Cache of raw GDELT API responses ("sqlite", "files" or "none").
+    gdelt_cache_backend: str = "sqlite"
+    gdelt_cache_path: str = ".cache/gdelt.sqlite"
+    gdelt_cache_ttl: int = 3600                 # seconds, for windows touching "now"
+    gdelt_cache_settle_period: int = 24 * 3600  # seconds after a window closes before it never expires
+
+    # Adaptive tonechart windows, planned per country from the volumes seen in earlier runs.
+    adaptive_windows: bool = True                # False: fixed windows of window_initial
+    window_profile_path: str = ".cache/window_profile.sqlite"
+    window_initial: int = 7 * 24 * 3600          # seconds, windows of a period no run has fetched yet
+    window_min: int = 24 * 3600                  # seconds, windows are not bisected below this
+    window_max: int = 28 * 24 * 3600             # seconds, quiet windows are not merged beyond this
+    window_min_coverage: float = 0.5             # bisect windows GDELT lists fewer of the matched articles of
+
+    # Output.
+    output_sink: str = "json"                    # "json" (output_dir) or "parquet" (parquet_output_dir)
+    output_dir: str = "output2"
+    parquet_output_dir: str = "output_parquet"
+    parquet_row_group_size: int = 10000
+    ledger_path: Optional[str] = None            # task states, defaults to .ledger.sqlite in the sink's directory
+    max_task_attempts: int = 3
+    aggregate_store_enabled: bool = True        # per-window weighted tone, updated as tasks complete
+    aggregate_store_path: Optional[str] = None  # defaults to .aggregates.sqlite in the sink's directory
+    write_queue_size: int = 1000         # parsed records waiting for the writer
+    dedup_max_entries: int = 10000       # extracted articles kept to answer later duplicates, per process (not shared by workers)
+
+    # Syndicated copies of a story under other URLs, found by MinHash LSH over the extracted bodies.
+    near_duplicates: str = "tag"                 # "tag" (story of every article), "collapse" (copies written without text) or "off"
+    near_duplicate_index_path: str = ".cache/near_duplicates.sqlite"  # kept across runs, shared by the workers like the ledger
+    near_duplicate_bands: int = 32               # LSH bands of near_duplicate_rows minhash values each
+    near_duplicate_rows: int = 4
+    near_duplicate_threshold: float = 0.6        # estimated Jaccard similarity of the word 5-grams of two copies
+
+    # Coordinator/worker mode: workers on any number of processes or hosts share the ledger.
+    worker_lease_seconds: float = 120.0          # tasks of a worker silent for this long go to others
+    worker_heartbeat_interval: float = 20.0      # seconds between lease renewals
+    worker_poll_interval: float = 5.0            # seconds between claims when there is nothing to run
+    gdelt_global_requests_per_second: Optional[float] = None  # API budget shared by every worker, off unless set
+    gdelt_rate_budget_path: str = ".cache/gdelt_rate_budget.sqlite"  # must be shared by the workers, like the ledger
+
+    # Metrics and profiling, all off unless set.
+    metrics_snapshot_path: Optional[str] = None  # JSON lines file, one registry snapshot per interval
+    metrics_snapshot_interval: float = 30.0      # seconds
+    metrics_port: Optional[int] = None           # serve Prometheus metrics on http://127.0.0.1:<port>/metrics
+    profile_path: Optional[str] = None           # folded stacks of the event loop thread, for flamegraphs
+    profile_interval: float = 0.005              # seconds between profiler samples
+
     gdelt_doc_base_url: str = "https://api.gdeltproject.org/api/v2/doc/doc"
 
     epsilon: float = 0.001  # a very small number
@@ -36,3 +111,22 @@ class Settings(BaseSettings):
         "slightly_negative": f"tone>{-5 - epsilon} tone<-0.5"     # "tone>-5.001 tone<-0.5"
     }
 
+
+def parse_overrides(values: List[str]) -> dict:
+    """
+    Settings from name=value strings, e.g. --set options; JSON values (numbers, lists, true) are decoded,
+    anything else is kept as a string.
+    """
+    overrides = {}
+    for value in values:
+        name, _, raw = value.partition("=")
+        if name not in Settings.model_fields:
+            raise ValueError(f"Unknown setting: {name}")
+        overrides[name] = raw
+        if raw[:1] in "[{\"0123456789-" or raw in ("true", "false"):
+            try:
+                overrides[name] = json.loads(raw)
+            except ValueError:
+                # A string that only starts like JSON, e.g. -foo, or an empty value
+                pass
+    return overrides
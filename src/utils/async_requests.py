@@ -0,0 +1,127 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+from pydantic import BaseModel, Field
+
+from src.utils.host_scheduler import HostScheduler
+from src.utils.html_cache import HTMLCache
+from src.utils.metrics import track
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; GDELT-Scraper/1.0; +http://example.com)"
+}
+
+# Stage of article downloads in pipeline_stage_seconds
+FETCH = "fetch"
+
+
+def create_async_session(max_connections: int = 500, max_connections_per_host: int = 8, timeout: int = 5) -> aiohttp.ClientSession:
+    """
+    Create a new aiohttp session whose connector keeps a bounded keep-alive pool per host.
+    Must be called from inside a running event loop.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=max_connections,
+        limit_per_host=max_connections_per_host,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=DEFAULT_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    )
+
+
+class FetchStats(BaseModel):
+    requests: int = Field(0, description="Responses received, including 304 Not Modified")
+    bytes_downloaded: int = Field(0, description="Response body bytes received")
+
+
+class AsyncFetcher:
+    """
+    Non-blocking HTTP fetcher whose requests are paced across hosts by a HostScheduler.
+    One instance is shared by every task of a run, so the limits are global to the run.
+    """
+    __session: aiohttp.ClientSession
+    __scheduler: HostScheduler
+    __cache: Optional[HTMLCache]
+    stats: FetchStats
+
+    def __init__(self, session: aiohttp.ClientSession, scheduler: Optional[HostScheduler] = None,
+                 cache: Optional[HTMLCache] = None):
+        self.__session = session
+        self.__scheduler = scheduler if scheduler is not None else HostScheduler()
+        self.__cache = cache
+        self.stats = FetchStats()
+
+    async def __read(self, response: aiohttp.ClientResponse) -> bytes:
+        body = await response.read()
+        self.stats.requests += 1
+        self.stats.bytes_downloaded += len(body)
+        return body
+
+    @property
+    def scheduler(self) -> HostScheduler:
+        return self.__scheduler
+
+    async def __text(self, url: str, **kwargs) -> str:
+        async with self.__session.get(url, **kwargs) as response:
+            response.raise_for_status()  # raise an HTTPError for bad responses
+            await self.__read(response)
+            # aiohttp falls back to utf-8 when the response declares no encoding
+            return await response.text(errors="replace")
+
+    async def fetch_text(self, url: str, timeout: Optional[float] = None) -> str:
+        # Only override the session timeout when asked to, None would disable it
+        kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        async with self.__scheduler.slot(url):
+            return await self.__text(url, **kwargs)
+
+    async def fetch_bytes(self, url: str, timeout: Optional[float] = None) -> bytes:
+        kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        async with self.__scheduler.slot(url):
+            async with self.__session.get(url, **kwargs) as response:
+                response.raise_for_status()
+                return await self.__read(response)
+
+    async def fetch_html(self, url: str) -> str:
+        """
+        HTML of an article, through the cache if there is one. Timed as the FETCH stage once a
+        host slot is held, the wait for the slot goes to host_slot_wait_seconds.
+        """
+        if self.__cache is None:
+            async with self.__scheduler.slot(url):
+                with track(FETCH):
+                    return await self.__text(url)
+
+        entry = await asyncio.to_thread(self.__cache.lookup, url)
+        if entry is not None and self.__cache.is_fresh(entry):
+            with track(FETCH):
+                html = await asyncio.to_thread(self.__cache.read, entry)
+            if html is not None:
+                return html
+            # Evicted since the lookup by another task's store
+            entry = None
+
+        while True:
+            async with self.__scheduler.slot(url):
+                with track(FETCH):
+                    async with self.__session.get(url, headers=HTMLCache.conditional_headers(entry)) as response:
+                        if response.status == 304 and entry is not None:
+                            self.stats.requests += 1
+                            html = await asyncio.to_thread(self.__cache.read, entry, True)
+                            if html is not None:
+                                return html
+                            # Evicted while revalidating, downloaded again without validators
+                            entry = None
+                            continue
+                        response.raise_for_status()
+                        await self.__read(response)
+                        html = await response.text(errors="replace")
+                        etag = response.headers.get("ETag")
+                        last_modified = response.headers.get("Last-Modified")
+            break
+
+        await asyncio.to_thread(self.__cache.store, url, html, etag, last_modified)
+        return html
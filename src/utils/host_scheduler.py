@@ -0,0 +1,195 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+from pydantic import BaseModel
+
+from src.utils.metrics import REGISTRY
+from src.utils.rate_limit import is_retryable, is_throttle
+
+# Weight of the newest sample in a host's latency average
+LATENCY_SMOOTHING = 0.2
+
+SLOT_WAIT_SECONDS = REGISTRY.histogram("host_slot_wait_seconds", "Time requests waited for a slot of their host")
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class HostStats(BaseModel):
+    hosts: int = 0
+    slow: int = 0
+    cooling_down: int = 0
+    requests: int = 0
+    failures: int = 0
+
+
+class _Host:
+    __slots__ = ("name", "in_flight", "waiters", "latency", "failures", "cooldowns", "blocked_until", "wakeup")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.cooldowns = 0
+        self.blocked_until = 0.0
+        self.wakeup: Optional[asyncio.TimerHandle] = None
+
+
+class HostScheduler:
+    """
+    Hands out request slots across hosts so that no single site can stall the others.
+
+    A request only takes one of the max_concurrent slots once its host has capacity, so requests
+    queued behind a slow host never hold slots other hosts could use. Hosts with waiting requests
+    are served round-robin. Hosts whose average latency exceeds slow_latency are only served
+    when no fast host can be, with a quarter of max_per_host while others wait. After
+    failure_threshold consecutive connection errors, timeouts or 5xx responses a host cools down
+    for failure_cooldown seconds, doubling on every further round of failures.
+    """
+    __max_concurrent: int
+    __max_per_host: int
+    __slow_latency: float
+    __failure_threshold: int
+    __failure_cooldown: float
+    __max_cooldown: float
+    __hosts: Dict[str, _Host]
+    __ready: "OrderedDict[str, _Host]"
+    __in_flight: int
+    stats: HostStats
+
+    def __init__(self, max_concurrent: int = 500, max_per_host: int = 8, slow_latency: float = 2.0,
+                 failure_threshold: int = 3, failure_cooldown: float = 30.0, max_cooldown: float = 600.0):
+        self.__max_concurrent = max_concurrent
+        self.__max_per_host = max_per_host
+        self.__slow_latency = slow_latency
+        self.__failure_threshold = failure_threshold
+        self.__failure_cooldown = failure_cooldown
+        self.__max_cooldown = max_cooldown
+        self.__hosts = {}
+        self.__ready = OrderedDict()
+        self.__in_flight = 0
+        self.stats = HostStats()
+
+    def __host(self, url: str) -> _Host:
+        name = host_of(url)
+        host = self.__hosts.get(name)
+        if host is None:
+            host = self.__hosts[name] = _Host(name)
+            self.stats.hosts += 1
+        return host
+
+    def __is_slow(self, host: _Host) -> bool:
+        return host.latency is not None and host.latency > self.__slow_latency
+
+    def __limit(self, host: _Host) -> int:
+        # Slow hosts only give up slots while other hosts have requests waiting
+        if self.__is_slow(host) and len(self.__ready) > 1:
+            return max(1, self.__max_per_host // 4)
+        return self.__max_per_host
+
+    def __pick(self, now: float) -> Optional[_Host]:
+        slow_candidate = None
+        for host in list(self.__ready.values()):
+            while host.waiters and host.waiters[0].done():
+                host.waiters.popleft()  # cancelled while waiting
+            if not host.waiters:
+                del self.__ready[host.name]
+                continue
+            if host.blocked_until > now:
+                self.__schedule_wakeup(host)
+                continue
+            if host.in_flight >= self.__limit(host):
+                continue
+            if not self.__is_slow(host):
+                return host
+            if slow_candidate is None:
+                slow_candidate = host
+        return slow_candidate
+
+    def __schedule_wakeup(self, host: _Host):
+        if host.wakeup is None:
+            loop = asyncio.get_running_loop()
+            host.wakeup = loop.call_at(host.blocked_until, self.__wake, host)
+
+    def __wake(self, host: _Host):
+        host.wakeup = None
+        self.__dispatch()
+
+    def __dispatch(self):
+        now = asyncio.get_running_loop().time()
+        while self.__in_flight < self.__max_concurrent:
+            host = self.__pick(now)
+            if host is None:
+                return
+            host.waiters.popleft().set_result(None)
+            host.in_flight += 1
+            self.__in_flight += 1
+            # Round-robin: the host goes to the back of the line
+            self.__ready.move_to_end(host.name)
+
+    def __release(self, host: _Host):
+        host.in_flight -= 1
+        self.__in_flight -= 1
+        self.__dispatch()
+
+    def __record(self, host: _Host, elapsed: Optional[float], error: Optional[BaseException]):
+        self.stats.requests += 1
+        if error is not None and is_retryable(error) and not is_throttle(error):
+            self.stats.failures += 1
+            host.failures += 1
+            if host.failures >= self.__failure_threshold:
+                cooldown = min(self.__max_cooldown, self.__failure_cooldown * 2 ** host.cooldowns)
+                host.blocked_until = asyncio.get_running_loop().time() + cooldown
+                host.cooldowns += 1
+                host.failures = 0
+                logger.warning(f"Host {host.name} keeps failing, pausing it for {cooldown:.0f}s")
+            return
+        host.failures = 0
+        host.cooldowns = 0
+        if elapsed is not None:
+            host.latency = elapsed if host.latency is None else (1 - LATENCY_SMOOTHING) * host.latency + LATENCY_SMOOTHING * elapsed
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """
+        Hold one request slot for url's host for the duration of the block.
+        """
+        host = self.__host(url)
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        host.waiters.append(waiter)
+        self.__ready.setdefault(host.name, host)
+        self.__dispatch()
+        start = loop.time()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been granted right before the cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.__release(host)
+            raise
+        SLOT_WAIT_SECONDS.observe(loop.time() - start)
+
+        start = loop.time()
+        try:
+            yield
+        except Exception as e:
+            self.__record(host, None, e)
+            raise
+        else:
+            self.__record(host, loop.time() - start, None)
+        finally:
+            self.__release(host)
+
+    def summary(self) -> HostStats:
+        now = asyncio.get_running_loop().time()
+        self.stats.slow = sum(1 for host in self.__hosts.values() if self.__is_slow(host))
+        self.stats.cooling_down = sum(1 for host in self.__hosts.values() if host.blocked_until > now)
+        return self.stats
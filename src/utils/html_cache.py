@@ -0,0 +1,175 @@
+import os
+import sqlite3
+import time
+import zlib
+from threading import Lock
+from typing import Dict, NamedTuple, Optional
+
+from pydantic import BaseModel, Field
+
+from src.utils.urls import normalize_url, url_key
+
+
+class CacheEntry(NamedTuple):
+    key: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    size: int
+    fetched_at: float
+
+
+class CacheStats(BaseModel):
+    hits: int = Field(0, description="Pages served from disk without a request")
+    revalidated: int = Field(0, description="Pages served from disk after a 304 Not Modified")
+    misses: int = Field(0, description="Pages downloaded in full")
+    bytes_read: int = Field(0, description="Compressed bytes read from the cache")
+    bytes_written: int = Field(0, description="Compressed bytes written to the cache")
+    evictions: int = Field(0, description="Entries evicted to stay under the size limit")
+
+
+class HTMLCache:
+    """
+    Persistent on-disk cache for article HTML.
+
+    Pages are stored as zlib-compressed blobs under <cache_dir>/<key[:2]>/<key>, where the key is
+    the SHA-256 of the normalized URL. A SQLite index keeps the validators (ETag/Last-Modified),
+    sizes and access times used for conditional revalidation and LRU eviction.
+    """
+    __cache_dir: str
+    __max_bytes: int
+    __max_age: float
+    __connection: sqlite3.Connection
+    __lock: Lock
+    __total_bytes: int
+    stats: CacheStats
+
+    def __init__(self, cache_dir: str, max_bytes: int = 5 * 1024 ** 3, max_age: float = 7 * 24 * 3600):
+        self.__cache_dir = cache_dir
+        self.__max_bytes = max_bytes
+        self.__max_age = max_age
+        self.__lock = Lock()
+        self.stats = CacheStats()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.__connection = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self.__connection.commit()
+        self.__total_bytes = self.__connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def __blob_path(self, key: str) -> str:
+        return os.path.join(self.__cache_dir, key[:2], key)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT key, etag, last_modified, size, fetched_at FROM entries WHERE key = ?", (url_key(url),)
+            ).fetchone()
+        if row is None or not os.path.exists(self.__blob_path(row[0])):
+            return None
+        return CacheEntry(*row)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.__max_age
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def read(self, entry: CacheEntry, revalidated: bool = False) -> Optional[str]:
+        """
+        Load a cached page and count it as a hit. Pass revalidated=True after a 304 response.
+        None if the page was evicted since lookup(), to be downloaded again like a miss.
+        """
+        try:
+            with open(self.__blob_path(entry.key), "rb") as file:
+                blob = file.read()
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        with self.__lock:
+            if revalidated:
+                self.stats.revalidated += 1
+                # A 304 restarts the freshness window
+                self.__connection.execute(
+                    "UPDATE entries SET last_access = ?, fetched_at = ? WHERE key = ?", (now, now, entry.key)
+                )
+            else:
+                self.stats.hits += 1
+                self.__connection.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, entry.key))
+            self.__connection.commit()
+            self.stats.bytes_read += len(blob)
+        return zlib.decompress(blob).decode("utf-8")
+
+    def store(self, url: str, html: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Save a freshly downloaded page and count it as a miss.
+        """
+        key = url_key(url)
+        blob = zlib.compress(html.encode("utf-8"), 6)
+        path = self.__blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial blob
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(blob)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self.__lock:
+            previous = self.__connection.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO entries (key, url, etag, last_modified, size, fetched_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_url(url), etag, last_modified, len(blob), now, now)
+            )
+            self.__total_bytes += len(blob) - (previous[0] if previous else 0)
+            self.stats.misses += 1
+            self.stats.bytes_written += len(blob)
+            if self.__total_bytes > self.__max_bytes:
+                self.__evict()
+            self.__connection.commit()
+
+    def __evict(self):
+        """
+        Drop least recently used entries until the cache is back under 90% of its size limit.
+        Must be called with the lock held.
+        """
+        target = int(self.__max_bytes * 0.9)
+        cursor = self.__connection.execute("SELECT key, size FROM entries ORDER BY last_access")
+        evicted = []
+        for key, size in cursor:
+            if self.__total_bytes <= target:
+                break
+            evicted.append(key)
+            self.__total_bytes -= size
+        for key in evicted:
+            try:
+                os.remove(self.__blob_path(key))
+            except FileNotFoundError:
+                pass
+        self.__connection.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in evicted])
+        self.stats.evictions += len(evicted)
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
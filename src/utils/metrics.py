@@ -0,0 +1,384 @@
+import asyncio
+import json
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as FrequencyCounter
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+# Seconds, from cache hits and parses up to slow downloads and GDELT retries
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self) -> List[int]:
+        total, cumulative = 0, []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate from the buckets, interpolating linearly inside the bucket the quantile falls in.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for upper, count in zip(self.buckets + (math.inf,), self.counts):
+            if seen + count >= rank and count:
+                if math.isinf(upper):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return lower
+
+
+class Metric:
+    """
+    A named family of values, one per combination of label values.
+    """
+    kind = ""
+    name: str
+    help: str
+    label_names: Tuple[str, ...]
+    __children: Dict[LabelValues, object]
+    __lock: threading.Lock
+
+    def __init__(self, name: str, help: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.__children = {}
+        self.__lock = threading.Lock()
+
+    def _new_value(self):
+        return _Value()
+
+    def labels(self, **labels: str):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        child = self.__children.get(key)
+        if child is None:
+            with self.__lock:
+                child = self.__children.setdefault(key, self._new_value())
+        return child
+
+    def children(self) -> List[Tuple[LabelValues, object]]:
+        return list(self.__children.items())
+
+    def _unlabelled(self):
+        if self.label_names:
+            raise ValueError(f"{self.name} has labels {self.label_names}, use labels()")
+        return self.labels()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1):
+        self._unlabelled().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._unlabelled().dec(amount)
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+    buckets: Tuple[float, ...]
+
+    def __init__(self, name: str, help: str, label_names: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of metrics. Metrics are created once, at import time of the module that
+    owns them; callbacks expose values kept elsewhere (cache stats, queue sizes) at export time.
+    """
+    __metrics: Dict[str, Metric]
+    __callbacks: Dict[str, Tuple[str, str, Callable[[], Dict[LabelValues, float]], Tuple[str, ...]]]
+
+    def __init__(self):
+        self.__metrics = {}
+        self.__callbacks = {}
+
+    def __register(self, metric: Metric) -> Metric:
+        existing = self.__metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                raise ValueError(f"Metric {metric.name} is already registered differently")
+            return existing
+        self.__metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, label_names: Iterable[str] = ()) -> Counter:
+        return self.__register(Counter(name, help, label_names))
+
+    def gauge(self, name: str, help: str, label_names: Iterable[str] = ()) -> Gauge:
+        return self.__register(Gauge(name, help, label_names))
+
+    def histogram(self, name: str, help: str, label_names: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.__register(Histogram(name, help, label_names, buckets))
+
+    def register_callback(self, name: str, help: str, callback: Callable[[], Dict[LabelValues, float]],
+                          label_names: Iterable[str] = (), kind: str = "gauge"):
+        """
+        Export values computed by callback() -> {label values: value} whenever metrics are read.
+        Registering the same name again replaces the callback, e.g. for the objects of a new run.
+        """
+        self.__callbacks[name] = (kind, help, callback, tuple(label_names))
+
+    def unregister_callback(self, name: str):
+        self.__callbacks.pop(name, None)
+
+    def __callback_samples(self) -> List[Tuple[str, str, str, Tuple[str, ...], Dict[LabelValues, float]]]:
+        samples = []
+        for name, (kind, help, callback, label_names) in list(self.__callbacks.items()):
+            try:
+                samples.append((name, kind, help, label_names, callback()))
+            except Exception as e:
+                logger.warning(f"Metric callback {name} failed: {e}")
+        return samples
+
+    def snapshot(self) -> dict:
+        metrics = {}
+        for metric in self.__metrics.values():
+            samples = []
+            for label_values, value in metric.children():
+                labels = dict(zip(metric.label_names, label_values))
+                if isinstance(value, _HistogramValue):
+                    samples.append({
+                        "labels": labels, "count": value.count, "sum": round(value.sum, 6),
+                        **{f"p{round(q * 100)}": _round(value.quantile(q)) for q in (0.5, 0.95, 0.99)},
+                    })
+                else:
+                    samples.append({"labels": labels, "value": value.value})
+            metrics[metric.name] = {"type": metric.kind, "help": metric.help, "samples": samples}
+        for name, kind, help, label_names, values in self.__callback_samples():
+            metrics[name] = {"type": kind, "help": help, "samples": [
+                {"labels": dict(zip(label_names, label_values)), "value": value} for label_values, value in values.items()
+            ]}
+        return {"timestamp": time.time(), "metrics": metrics}
+
+    def prometheus_text(self) -> str:
+        """
+        The registry in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self.__metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for label_values, value in metric.children():
+                labels = list(zip(metric.label_names, label_values))
+                if isinstance(value, _HistogramValue):
+                    for upper, count in zip(value.buckets + (math.inf,), value.cumulative()):
+                        bound = "+Inf" if math.isinf(upper) else repr(float(upper))
+                        lines.append(f"{metric.name}_bucket{_format_labels(labels + [('le', bound)])} {count}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {value.sum}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {value.count}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(labels)} {value.value}")
+        for name, kind, help, label_names, values in self.__callback_samples():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label_values, value in values.items():
+                lines.append(f"{name}{_format_labels(list(zip(label_names, label_values)))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 6)
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram("pipeline_stage_seconds", "Duration of each pipeline stage call", ["stage"])
+STAGE_ERRORS = REGISTRY.counter("pipeline_stage_errors_total", "Pipeline stage calls that raised", ["stage"])
+STAGE_IN_FLIGHT = REGISTRY.gauge("pipeline_stage_in_flight", "Pipeline stage calls currently running", ["stage"])
+
+
+@contextmanager
+def track(stage: str) -> Iterator[None]:
+    """
+    Time one call of a stage, count it as in flight while it runs and as an error if it raises.
+    """
+    in_flight = STAGE_IN_FLIGHT.labels(stage=stage)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+        in_flight.dec()
+
+
+async def write_snapshots(registry: MetricsRegistry, path: str, interval: float):
+    """
+    Append a JSON snapshot of the registry to path every interval seconds until cancelled,
+    and once more on the way out.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def append():
+        with open(path, "a") as file:
+            file.write(json.dumps(registry.snapshot()) + "\n")
+
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(append)
+    finally:
+        append()
+
+
+async def start_metrics_server(registry: MetricsRegistry, port: int, host: str = "127.0.0.1") -> "web.AppRunner":
+    """
+    Serve the registry on http://host:port/metrics for Prometheus, on the running event loop.
+    """
+    from aiohttp import web
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(text=registry.prometheus_text(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread (the event loop's, by default the caller's) every interval
+    seconds from a background thread, for finding hot spots in long runs without a tracing
+    profiler's overhead. Stacks are written in the folded format flamegraph tools read.
+    Parsing runs in worker processes and is not sampled.
+    """
+    __interval: float
+    __thread_id: int
+    __stacks: FrequencyCounter
+    __stop: threading.Event
+    __thread: Optional[threading.Thread]
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.__interval = interval
+        self.__thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.__stacks = FrequencyCounter()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def __sample(self):
+        while not self.__stop.wait(self.__interval):
+            frame = sys._current_frames().get(self.__thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.__stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__sample, name="sampling-profiler", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def top(self, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Functions that were on top of the stack most often, with their share of the samples.
+        """
+        total = sum(self.__stacks.values())
+        leaves = FrequencyCounter()
+        for stack, count in self.__stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [(function, count / total) for function, count in leaves.most_common(limit)] if total else []
+
+    def write(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            for stack, count in self.__stacks.most_common():
+                file.write(f"{stack} {count}\n")
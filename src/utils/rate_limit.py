@@ -0,0 +1,283 @@
+import asyncio
+import os
+import random
+import sqlite3
+import time
+from threading import Lock
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import aiohttp
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class ThrottledError(Exception):
+    """
+    The server asked us to slow down without using a 429 status (GDELT answers
+    "Please limit requests to one every 5 seconds" with a 200).
+    """
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by every caller on the event loop.
+
+    The rate grows additively after each success and is cut multiplicatively whenever the
+    server throttles us (AIMD), so it settles just below what the server tolerates.
+    """
+    rate: float
+    __min_rate: float
+    __max_rate: float
+    __burst: float
+    __increase: float
+    __decrease: float
+    __tokens: float
+    __updated: float
+    __lock: asyncio.Lock
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float, burst: float = 1,
+                 increase: float = 0.01, decrease: float = 0.5):
+        self.rate = rate
+        self.__min_rate = min_rate
+        self.__max_rate = max_rate
+        self.__burst = burst
+        self.__increase = increase
+        self.__decrease = decrease
+        self.__tokens = burst
+        self.__updated = time.monotonic()
+        self.__lock = asyncio.Lock()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.rate)
+        self.__updated = now
+
+    async def acquire(self):
+        # The lock hands out tokens in arrival order
+        async with self.__lock:
+            while True:
+                self.__refill()
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.__tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.__max_rate, self.rate + self.__increase)
+
+    def on_throttle(self):
+        self.rate = max(self.__min_rate, self.rate * self.__decrease)
+        logger.warning(f"Throttled, request rate lowered to {self.rate:.3f}/s")
+
+
+class GlobalRateBudget:
+    """
+    Token bucket kept in a SQLite file, shared by every process and host that opens the same file,
+    so workers together stay within one request rate. Each worker's AdaptiveRateLimiter still
+    backs off on its own; this only caps their sum. Hosts sharing a budget need synchronized clocks.
+    """
+    __rate: float
+    __burst: float
+    __connection: sqlite3.Connection
+    __lock: Lock
+
+    def __init__(self, path: str, rate: float, burst: float = 1):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__rate = rate
+        self.__burst = burst
+        self.__lock = Lock()
+        # isolation_level=None: transactions are opened explicitly, with BEGIN IMMEDIATE
+        self.__connection = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS budget (id INTEGER PRIMARY KEY CHECK (id = 0), tokens REAL, updated REAL)")
+        self.__connection.execute("INSERT OR IGNORE INTO budget VALUES (0, ?, ?)", (burst, time.time()))
+
+    def __take(self) -> float:
+        """
+        Take a token if one is available. Returns 0 on success, or how long to wait for the next one.
+        """
+        with self.__lock:
+            self.__connection.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated = self.__connection.execute("SELECT tokens, updated FROM budget WHERE id = 0").fetchone()
+                now = time.time()
+                tokens = min(self.__burst, tokens + max(0.0, now - updated) * self.__rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.__rate
+                if wait == 0:
+                    tokens -= 1
+                self.__connection.execute("UPDATE budget SET tokens = ?, updated = ? WHERE id = 0", (tokens, now))
+                self.__connection.execute("COMMIT")
+            except BaseException:
+                self.__connection.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def acquire(self):
+        while True:
+            wait = await asyncio.to_thread(self.__take)
+            if wait == 0:
+                return
+            # Another worker may take the token first, so wait a random share longer
+            await asyncio.sleep(wait * random.uniform(1, 1.5))
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and makes every caller wait out the
+    cooldown. The breaker is then half-open: a single caller goes through as a probe while the
+    others keep waiting, its success closes the breaker and its failure opens it again.
+    """
+    __failure_threshold: int
+    __cooldown: float
+    __failures: int
+    __open_until: float
+    __half_open: bool
+    __probe: Optional[asyncio.Event]
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 60):
+        self.__failure_threshold = failure_threshold
+        self.__cooldown = cooldown
+        self.__failures = 0
+        self.__open_until = 0
+        self.__half_open = False
+        self.__probe = None
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self.__open_until
+
+    async def wait(self) -> bool:
+        """
+        Returns once a request may go through, True for the caller that probes a half-open breaker.
+        """
+        while True:
+            delay = self.__open_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif not self.__half_open:
+                return False
+            elif self.__probe is None:
+                self.__probe = asyncio.Event()
+                return True
+            else:
+                await self.__probe.wait()
+
+    def record_success(self):
+        self.__failures = 0
+        if self.__half_open:
+            self.__half_open = False
+            logger.info("Circuit breaker closed")
+        self.__end_probe()
+
+    def record_failure(self):
+        if self.is_open:
+            # Requests that were in flight when it opened
+            return
+        self.__failures += 1
+        if self.__half_open or self.__failures >= self.__failure_threshold:
+            self.__open_until = time.monotonic() + self.__cooldown
+            self.__failures = 0
+            self.__half_open = True
+            self.__end_probe()
+            logger.warning(f"Circuit breaker open, pausing all requests for {self.__cooldown}s")
+
+    def abandon_probe(self):
+        """
+        The probe ended without telling whether the endpoint recovered, the next caller probes instead.
+        """
+        self.__end_probe()
+
+    def __end_probe(self):
+        if self.__probe is not None:
+            self.__probe.set()
+            self.__probe = None
+
+
+def is_throttle(error: Exception) -> bool:
+    return isinstance(error, ThrottledError) or (
+        isinstance(error, aiohttp.ClientResponseError) and error.status == 429
+    )
+
+
+def is_retryable(error: Exception) -> bool:
+    if is_throttle(error):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None)
+    if not headers or "Retry-After" not in headers:
+        return None
+    try:
+        return float(headers["Retry-After"])
+    except ValueError:
+        return None
+
+
+class RequestScheduler:
+    """
+    Runs requests through the rate limiter, the shared budget if any, and the circuit breaker,
+    retrying throttled, failed (5xx) and timed out requests with exponential backoff and full jitter.
+    """
+    __limiter: AdaptiveRateLimiter
+    __breaker: CircuitBreaker
+    __max_retries: int
+    __backoff_base: float
+    __backoff_max: float
+    __budget: Optional[GlobalRateBudget]
+
+    def __init__(self, limiter: AdaptiveRateLimiter, breaker: CircuitBreaker, max_retries: int = 5,
+                 backoff_base: float = 2, backoff_max: float = 120, budget: Optional[GlobalRateBudget] = None):
+        self.__limiter = limiter
+        self.__breaker = breaker
+        self.__max_retries = max_retries
+        self.__backoff_base = backoff_base
+        self.__backoff_max = backoff_max
+        self.__budget = budget
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.__backoff_max, self.__backoff_base * 2 ** attempt))
+        server_delay = retry_after(error)
+        return max(delay, server_delay) if server_delay is not None else delay
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            probe = await self.__breaker.wait()
+            try:
+                await self.__limiter.acquire()
+                if self.__budget is not None:
+                    await self.__budget.acquire()
+                result = await request()
+            except Exception as e:
+                if not is_retryable(e):
+                    if probe:
+                        self.__breaker.abandon_probe()
+                    raise
+                if is_throttle(e):
+                    self.__limiter.on_throttle()
+                self.__breaker.record_failure()
+                if attempt >= self.__max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                attempt += 1
+                logger.warning(f"Request failed ({type(e).__name__}: {e}), retry {attempt}/{self.__max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled
+                if probe:
+                    self.__breaker.abandon_probe()
+                raise
+            self.__limiter.on_success()
+            self.__breaker.record_success()
+            return result
@@ -1,5 +1,9 @@
+from typing import Optional
+
 import requests
 
+from src.utils.html_cache import HTMLCache
+
 def create_session(connection_pool_size: int = 20) -> requests.Session: 
     """
     Create a new requests session with a custom connection pool size and timeout.
@@ -15,12 +19,28 @@ def create_session(connection_pool_size: int = 20) -> requests.Session:
     return session
 
 
-def fetch_html(url: str, session: requests.Session, timeout: int) -> str:
-    response = session.get(url, timeout=timeout)
+def fetch_html(url: str, session: requests.Session, timeout: int, cache: Optional[HTMLCache] = None) -> str:
+    entry = cache.lookup(url) if cache is not None else None
+    if entry is not None and cache.is_fresh(entry):
+        html = cache.read(entry)
+        if html is not None:
+            return html
+        # Evicted since the lookup
+        entry = None
+
+    response = session.get(url, timeout=timeout, headers=HTMLCache.conditional_headers(entry))
+    if response.status_code == 304 and entry is not None:
+        html = cache.read(entry, revalidated=True)
+        if html is not None:
+            return html
+        # Evicted while revalidating, downloaded again without validators
+        response = session.get(url, timeout=timeout)
     response.raise_for_status()  # raise an HTTPError for bad responses
 
     # If no encoding is provided, let requests try to guess it
     if not response.encoding:
         response.encoding = response.apparent_encoding
 
+    if cache is not None:
+        cache.store(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
     return response.text
\ No newline at end of file
@@ -0,0 +1,55 @@
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so trivially different spellings of the same page compare equal:
+    lower-case scheme and host, default ports and fragments dropped, query parameters sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMETERS = re.compile(
+    r"^(utm_.*|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_ga|ref|ref_src|referrer|cmpid|ocid|"
+    r"smid|smtyp|sr_share|xtor|ito|icid|ns_campaign|ns_mchannel|ns_source|ns_linkname|ns_fee|"
+    r"amp|amp_js_v|usqp|outputtype|__twitter_impression)$",
+    re.IGNORECASE,
+)
+MOBILE_HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+AMP_PATH = re.compile(r"(/amp/?$|/amp(?=/)|\.amp(?=\.html?$)|\.amp$)", re.IGNORECASE)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Identity of an article for deduplication, stricter than normalize_url: tracking parameters
+    are dropped, http and https compare equal, and www./m./mobile./amp. hosts and AMP paths
+    (/amp, /amp/..., .amp.html) map to the regular page. The result is a key, not always a
+    fetchable URL.
+    """
+    parts = urlsplit(normalize_url(url))
+    host = parts.netloc
+    for prefix in MOBILE_HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+            break
+    path = AMP_PATH.sub("", parts.path).rstrip("/") or "/"
+    query = urlencode([(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not TRACKING_PARAMETERS.match(name)])
+    return urlunsplit(("https" if parts.scheme in ("http", "https") else parts.scheme, host, path, query, ""))
+
+
+def url_key(url: str) -> str:
+    """
+    Stable hex digest of the normalized URL.
+    """
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()